@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the NLI methods of the RamanFiber spans
+====================================================
+
+Propagates the default spectrum of the equipment library between the first two transceivers of an example network
+with each NLI method, and compares the elapsed time and the NLI and SNR at the receiver with the ones of the
+``ggn_spectrally_separated`` model. The comparison is restricted to the ``computed_channels`` of the simulation
+parameters, where the reference model is computed rather than interpolated.
+
+Usage: ``python benchmarks/nli_methods.py [NETWORK.json [EQUIPMENT.json [SIM_PARAMS.json]]]``
+"""
+
+import sys
+from pathlib import Path
+from time import perf_counter
+from networkx import dijkstra_path
+from numpy import array, abs, isin, mean
+
+from gnpy.core.elements import Transceiver
+from gnpy.core.equipment import trx_mode_params
+from gnpy.core.network import build_network
+from gnpy.core.parameters import SimParams
+from gnpy.core.science_utils import Simulation
+from gnpy.core.utils import lin2db
+from gnpy.tools.json_io import load_equipment, load_network, load_json
+from gnpy.topology.request import PathRequest, propagate
+
+EXAMPLE_DATA = Path(__file__).parent.parent / 'gnpy' / 'example-data'
+REFERENCE_METHOD = 'ggn_spectrally_separated'
+METHODS = (REFERENCE_METHOD, 'srs_closed_form', 'gn_model_analytic')
+
+
+def run(network_filename, equipment_filename, sim_params_filename, nli_method_name):
+    """ Propagates the default spectrum with nli_method_name
+    :return: channel numbers, NLI power of each channel at the receiver [W], SNR of each channel at the receiver [dB],
+        elapsed time [s]
+    """
+    sim_params = load_json(sim_params_filename)
+    sim_params['nli_parameters']['nli_method_name'] = nli_method_name
+    Simulation.set_params(SimParams(**sim_params))
+    equipment = load_equipment(equipment_filename)
+    network = load_network(network_filename, equipment)
+    source, destination = [n for n in network.nodes() if isinstance(n, Transceiver)][:2]
+    params = {'request_id': 0, 'trx_type': '', 'trx_mode': '', 'source': source.uid,
+              'destination': destination.uid, 'bidir': False, 'nodes_list': [destination.uid],
+              'loose_list': ['strict'], 'format': '', 'path_bandwidth': 0}
+    params.update(trx_mode_params(equipment))
+    req = PathRequest(**params)
+    pref_ch_db = lin2db(req.power * 1e3)
+    build_network(network, equipment, pref_ch_db, pref_ch_db + lin2db(req.nb_channel))
+    path = dijkstra_path(network, source, destination)
+
+    start = perf_counter()
+    spectral_info = propagate(path, req, equipment)
+    elapsed = perf_counter() - start
+    channel_numbers = array([carrier.channel_number for carrier in spectral_info.carriers])
+    nli = array([carrier.power.nli for carrier in spectral_info.carriers])
+    return channel_numbers, nli, array(path[-1].snr), elapsed
+
+
+def main(network_filename=EXAMPLE_DATA / 'raman_edfa_example_network.json',
+         equipment_filename=EXAMPLE_DATA / 'eqpt_config.json', sim_params_filename=EXAMPLE_DATA / 'sim_params.json'):
+    results = {method: run(network_filename, equipment_filename, sim_params_filename, method) for method in METHODS}
+    channel_numbers, reference_nli, reference_snr, _ = results[REFERENCE_METHOD]
+    computed = isin(channel_numbers, load_json(sim_params_filename)['nli_parameters']['computed_channels'])
+    print(f'{"method":<28}{"time (s)":>10}{"max NLI error (dB)":>22}{"mean NLI error (dB)":>22}'
+          f'{"max SNR error (dB)":>22}')
+    for method, (_, nli, snr, elapsed) in results.items():
+        nli_error = abs(lin2db(nli[computed] / reference_nli[computed]))
+        snr_error = abs(snr[computed] - reference_snr[computed])
+        print(f'{method:<28}{elapsed:>10.2f}{nli_error.max():>22.3f}{mean(nli_error):>22.3f}{snr_error.max():>22.3f}')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the stimulated Raman scattering solver
+===================================================
+
+Propagates the default spectrum of the equipment library between the first two transceivers of an example network
+with several configurations of the Raman solver: without the analytical Jacobians of the Raman boundary value problem,
+with them, and on spectral bins of several widths. Compares the Newton iterations, the evaluations of the Raman ODEs
+and the time spent in ``scipy.integrate.solve_bvp`` over all the RamanFiber spans, and the signal power of each
+channel at the receiver with the one of the full solution with the analytical Jacobians.
+
+Usage: ``python benchmarks/raman_solver.py [NETWORK.json [EQUIPMENT.json [SIM_PARAMS.json]]]``
+"""
+
+import sys
+from pathlib import Path
+from time import perf_counter
+from unittest.mock import patch
+from networkx import dijkstra_path
+from numpy import abs, array
+from scipy.integrate import solve_bvp
+
+from gnpy.core import science_utils
+from gnpy.core.elements import Transceiver
+from gnpy.core.equipment import trx_mode_params
+from gnpy.core.network import build_network
+from gnpy.core.parameters import SimParams
+from gnpy.core.science_utils import Simulation
+from gnpy.core.utils import lin2db
+from gnpy.tools.json_io import load_equipment, load_network, load_json
+from gnpy.topology.request import PathRequest, propagate
+
+EXAMPLE_DATA = Path(__file__).parent.parent / 'gnpy' / 'example-data'
+REFERENCE_SOLVER = 'analytical Jacobians'
+SOLVERS = {  # Jacobians, spectral_bin_width
+    'finite differences': (False, None),
+    REFERENCE_SOLVER: (True, None),
+    '0.5 THz bins': (True, 0.5e12),
+    '1 THz bins': (True, 1e12),
+    '2 THz bins': (True, 2e12),
+}
+
+
+class SolverStatistics:
+    """ Wraps solve_bvp to count the Newton iterations, the ODE evaluations and the elapsed time of each call"""
+
+    def __init__(self, jacobians=True):
+        self.jacobians = jacobians
+        self.iterations = 0
+        self.evaluations = 0
+        self.elapsed = 0
+
+    def solve_bvp(self, fun, bc, x, y, **kwargs):
+        if not self.jacobians:
+            kwargs.pop('fun_jac', None)
+            kwargs.pop('bc_jac', None)
+
+        def counted_fun(z, p):
+            self.evaluations += 1
+            return fun(z, p)
+
+        start = perf_counter()
+        solution = solve_bvp(counted_fun, bc, x, y, **kwargs)
+        self.elapsed += perf_counter() - start
+        self.iterations += solution.niter
+        return solution
+
+
+def run(network_filename, equipment_filename, sim_params_filename, jacobians, spectral_bin_width):
+    """ Propagates the default spectrum, with or without the analytical Jacobians and the spectral bins
+    :return: signal power of each channel at the receiver [W], solver statistics
+    """
+    sim_params = load_json(sim_params_filename)
+    sim_params['raman_parameters']['spectral_bin_width'] = spectral_bin_width
+    # the NLI does not depend on the Raman solver, skip its slow computation
+    sim_params['nli_parameters']['nli_method_name'] = 'gn_model_analytic'
+    Simulation.set_params(SimParams(**sim_params))
+    equipment = load_equipment(equipment_filename)
+    network = load_network(network_filename, equipment)
+    source, destination = [n for n in network.nodes() if isinstance(n, Transceiver)][:2]
+    params = {'request_id': 0, 'trx_type': '', 'trx_mode': '', 'source': source.uid,
+              'destination': destination.uid, 'bidir': False, 'nodes_list': [destination.uid],
+              'loose_list': ['strict'], 'format': '', 'path_bandwidth': 0}
+    params.update(trx_mode_params(equipment))
+    req = PathRequest(**params)
+    pref_ch_db = lin2db(req.power * 1e3)
+    build_network(network, equipment, pref_ch_db, pref_ch_db + lin2db(req.nb_channel))
+    path = dijkstra_path(network, source, destination)
+
+    statistics = SolverStatistics(jacobians)
+    with patch.object(science_utils, 'solve_bvp', statistics.solve_bvp):
+        spectral_info = propagate(path, req, equipment)
+    signal = array([carrier.power.signal for carrier in spectral_info.carriers])
+    return signal, statistics
+
+
+def main(network_filename=EXAMPLE_DATA / 'raman_edfa_example_network.json',
+         equipment_filename=EXAMPLE_DATA / 'eqpt_config.json', sim_params_filename=EXAMPLE_DATA / 'sim_params.json'):
+    results = {solver: run(network_filename, equipment_filename, sim_params_filename, *options)
+               for solver, options in SOLVERS.items()}
+    reference_signal, _ = results[REFERENCE_SOLVER]
+    print(f'{"solver":<22}{"iterations":>12}{"ODE evaluations":>18}{"time (s)":>10}{"max signal error (dB)":>24}')
+    for solver, (signal, statistics) in results.items():
+        signal_error = abs(lin2db(signal / reference_signal))
+        print(f'{solver:<22}{statistics.iterations:>12}{statistics.evaluations:>18}{statistics.elapsed:>10.3f}'
+              f'{signal_error.max():>24.2e}')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -8,7 +8,8 @@ gnpy.core.elements
 Standard network elements which propagate optical spectrum
 
 A network element is a Python callable. It takes a :class:`.info.SpectralInformation`
-object and returns a copy with appropriate fields affected. This structure
+object and returns a copy with appropriate fields affected, through its ``_replace`` method:
+a :class:`.info.SpectralInformationBuffer` is instead transformed in place and returned. This structure
 represents spectral information that is "propogated" by this network element.
 Network elements must have only a local "view" of the network and propogate
 :class:`.info.SpectralInformation` using only this information. They should be independent and
@@ -20,13 +21,17 @@ unique identifier and a printable name, and provide the :py:meth:`__call__` meth
 instance as a result.
 """
 
-from numpy import abs, arange, array, divide, errstate, ones, interp, mean, pi, polyfit, polyval, sum, sqrt
+from numpy import abs, arange, around, array, divide, errstate, ones, interp, maximum, mean, minimum, ndim, newaxis, \
+    pi, polyfit, polyval, sum, sqrt, where
 from scipy.constants import h, c
 from collections import namedtuple
+from copy import copy
 
 from gnpy.core.utils import lin2db, db2lin, arrange_frequencies, snr_sum
 from gnpy.core.parameters import FiberParams, PumpParams
-from gnpy.core.science_utils import NliSolver, RamanSolver, propagate_raman_fiber, _psi
+from gnpy.core.science_utils import NliSolver, RamanSolver, propagate_raman_fiber, gn_analytic_nli, nli_cache, \
+    spectral_gn_analytic_nli
+from gnpy.core.info import SpectralInformation
 
 
 class Location(namedtuple('Location', 'latitude longitude city region')):
@@ -34,6 +39,47 @@ class Location(namedtuple('Location', 'latitude longitude city region')):
         return super().__new__(cls, latitude, longitude, city, region)
 
 
+def _propagate_scenarios(element, spectral_info, **kwargs):
+    """ Propagates the scenarios of a spectral information one after the other through an element whose model
+    (e.g. the stimulated Raman scattering of a Raman fiber) is not vectorized over the scenarios. The attributes of
+    the element then describe the last scenario, as after successive propagations.
+    """
+    propagated_info = SpectralInformation.stack([element(spectral_info.scenario(index), **kwargs)
+                                                 for index in range(spectral_info.scenarios)])
+    # written back into spectral_info when it is a working buffer
+    return spectral_info._replace(**{field: getattr(propagated_info, field) for field in propagated_info._fields})
+
+
+def _keep_last_scenario(element, *attributes):
+    """ Reduces the attributes of an element propagating several scenarios at once, of one value or row per scenario,
+    to those of the last scenario, as after successive propagations
+    """
+    for attribute in attributes:
+        value = getattr(element, attribute)
+        if ndim(value):
+            setattr(element, attribute, value[-1])
+
+
+def _column(value):
+    """ Reshapes a value of each scenario to broadcast against the channels of each scenario"""
+    return value[..., newaxis] if ndim(value) else value
+
+
+def _minimum(value, other):
+    """ Minimum of values of each scenario, or builtin min of single values which keeps their type"""
+    return minimum(value, other) if ndim(value) or ndim(other) else min(value, other)
+
+
+def _maximum(value, other):
+    """ Maximum of values of each scenario, or builtin max of single values which keeps their type"""
+    return maximum(value, other) if ndim(value) or ndim(other) else max(value, other)
+
+
+def _round(value, ndigits):
+    """ Rounds values of each scenario, or a single value with the builtin round which keeps its type"""
+    return around(value, ndigits) if ndim(value) else round(value, ndigits)
+
+
 class _Node:
     '''Convenience class for providing common functionality of all network elements
 
@@ -87,28 +133,26 @@ class Transceiver(_Node):
     def _calc_cd(self, spectral_info):
         """ Updates the Transceiver property with the CD of the received channels. CD in ps/nm.
         """
-        self.chromatic_dispersion = [carrier.chromatic_dispersion * 1e3 for carrier in spectral_info.carriers]
+        self.chromatic_dispersion = list(spectral_info.chromatic_dispersion * 1e3)
 
     def _calc_pmd(self, spectral_info):
         """Updates the Transceiver property with the PMD of the received channels. PMD in ps.
         """
-        self.pmd = [carrier.pmd*1e12 for carrier in spectral_info.carriers]
+        self.pmd = list(spectral_info.pmd * 1e12)
 
     def _calc_snr(self, spectral_info):
         with errstate(divide='ignore'):
-            self.baud_rate = [c.baud_rate for c in spectral_info.carriers]
-            ratio_01nm = [lin2db(12.5e9 / b_rate) for b_rate in self.baud_rate]
+            self.baud_rate = list(spectral_info.baud_rate)
+            ratio_01nm = lin2db(12.5e9 / spectral_info.baud_rate)
             # set raw values to record original calculation, before update_snr()
-            self.raw_osnr_ase = [lin2db(divide(c.power.signal, c.power.ase))
-                                 for c in spectral_info.carriers]
-            self.raw_osnr_ase_01nm = [ase - ratio for ase, ratio
-                                      in zip(self.raw_osnr_ase, ratio_01nm)]
-            self.raw_osnr_nli = [lin2db(divide(c.power.signal, c.power.nli))
-                                 for c in spectral_info.carriers]
-            self.raw_snr = [lin2db(divide(c.power.signal, c.power.nli + c.power.ase))
-                            for c in spectral_info.carriers]
-            self.raw_snr_01nm = [snr - ratio for snr, ratio
-                                 in zip(self.raw_snr, ratio_01nm)]
+            raw_osnr_ase = lin2db(divide(spectral_info.signal, spectral_info.ase))
+            raw_osnr_nli = lin2db(divide(spectral_info.signal, spectral_info.nli))
+            raw_snr = lin2db(divide(spectral_info.signal, spectral_info.nli + spectral_info.ase))
+            self.raw_osnr_ase = list(raw_osnr_ase)
+            self.raw_osnr_ase_01nm = list(raw_osnr_ase - ratio_01nm)
+            self.raw_osnr_nli = list(raw_osnr_nli)
+            self.raw_snr = list(raw_snr)
+            self.raw_snr_01nm = list(raw_snr - ratio_01nm)
 
             self.osnr_ase = self.raw_osnr_ase
             self.osnr_ase_01nm = self.raw_osnr_ase_01nm
@@ -128,14 +172,21 @@ class Transceiver(_Node):
         for s in args:
             snr_added += db2lin(-s)
         snr_added = -lin2db(snr_added)
-        self.osnr_ase = list(map(lambda x, y: snr_sum(x, y, snr_added),
-                                 self.raw_osnr_ase, self.baud_rate))
-        self.snr = list(map(lambda x, y: snr_sum(x, y, snr_added),
-                            self.raw_snr, self.baud_rate))
-        self.osnr_ase_01nm = list(map(lambda x: snr_sum(x, 12.5e9, snr_added),
-                                      self.raw_osnr_ase_01nm))
-        self.snr_01nm = list(map(lambda x: snr_sum(x, 12.5e9, snr_added),
-                                 self.raw_snr_01nm))
+        baud_rate = array(self.baud_rate)
+        self.osnr_ase = list(snr_sum(array(self.raw_osnr_ase), baud_rate, snr_added))
+        self.snr = list(snr_sum(array(self.raw_snr), baud_rate, snr_added))
+        self.osnr_ase_01nm = list(snr_sum(array(self.raw_osnr_ase_01nm), 12.5e9, snr_added))
+        self.snr_01nm = list(snr_sum(array(self.raw_snr_01nm), 12.5e9, snr_added))
+
+    def scenario(self, index):
+        """ Returns a copy of the transceiver with the SNR, CD and PMD of one of the scenarios of the last
+        propagation of several scenarios, in which these attributes are scenarios x channels tables
+        """
+        transceiver = copy(self)
+        for attribute in ('raw_osnr_ase', 'raw_osnr_ase_01nm', 'raw_osnr_nli', 'raw_snr', 'raw_snr_01nm', 'osnr_ase',
+                          'osnr_ase_01nm', 'osnr_nli', 'snr', 'snr_01nm', 'chromatic_dispersion', 'pmd'):
+            setattr(transceiver, attribute, list(getattr(self, attribute)[index]))
+        return transceiver
 
     @property
     def to_json(self):
@@ -159,6 +210,9 @@ class Transceiver(_Node):
     def __str__(self):
         if self.snr is None or self.osnr_ase is None:
             return f'{type(self).__name__} {self.uid}'
+        if ndim(self.snr) == 2:
+            # scenarios x channels tables of a propagation of several scenarios
+            return '\n'.join(f'Scenario {index}: {self.scenario(index)}' for index in range(len(self.snr)))
 
         snr = round(mean(self.snr), 2)
         osnr_ase = round(mean(self.osnr_ase), 2)
@@ -223,7 +277,7 @@ class Roadm(_Node):
                           f'  effective loss (dB):  {self.effective_loss:.2f}',
                           f'  pch out (dBm):        {self.effective_pch_out_db!r}'])
 
-    def propagate(self, pref, *carriers, degree):
+    def propagate(self, spectral_info, degree):
         # pin_target and loss are read from eqpt_config.json['Roadm']
         # all ingress channels in xpress are set to this power level
         # but add channels are not, so we define an effective loss
@@ -233,28 +287,34 @@ class Roadm(_Node):
         # if the input power is lower than the target one, use the input power instead because
         # a ROADM doesn't amplify, it can only attenuate
         # TODO maybe add a minimum loss for the ROADM
-        per_degree_pch = self.per_degree_pch_out_db[degree] if degree in self.per_degree_pch_out_db.keys() else self.params.target_pch_out_db
-        self.effective_pch_out_db = min(pref.p_spani, per_degree_pch)
-        self.effective_loss = pref.p_spani - self.effective_pch_out_db
-        carriers_power = array([c.power.signal + c.power.nli + c.power.ase for c in carriers])
-        carriers_att = list(map(lambda x: lin2db(x * 1e3) - per_degree_pch, carriers_power))
-        exceeding_att = -min(list(filter(lambda x: x < 0, carriers_att)), default=0)
-        carriers_att = list(map(lambda x: db2lin(x + exceeding_att), carriers_att))
-        for carrier_att, carrier in zip(carriers_att, carriers):
-            pwr = carrier.power
-            pwr = pwr._replace(signal=pwr.signal / carrier_att,
-                               nli=pwr.nli / carrier_att,
-                               ase=pwr.ase / carrier_att)
-            pmd = sqrt(carrier.pmd**2 + self.params.pmd**2)
-            yield carrier._replace(power=pwr, pmd=pmd)
+        per_degree_pch = self._per_degree_pch(degree)
+        # with several scenarios, the powers and losses are computed for all of them at once
+        self.effective_pch_out_db = _minimum(spectral_info.pref.p_spani, per_degree_pch)
+        self.effective_loss = spectral_info.pref.p_spani - self.effective_pch_out_db
+        carriers_att = lin2db(spectral_info.total_power * 1e3) - per_degree_pch
+        exceeding_att = -minimum(carriers_att.min(axis=-1, initial=0, keepdims=True), 0)
+        carriers_att = db2lin(carriers_att + exceeding_att)
+        return spectral_info._replace(signal=spectral_info.signal / carriers_att,
+                                      nli=spectral_info.nli / carriers_att,
+                                      ase=spectral_info.ase / carriers_att,
+                                      pmd=sqrt(spectral_info.pmd**2 + self.params.pmd**2))
+
+    def _per_degree_pch(self, degree):
+        return self.per_degree_pch_out_db[degree] if degree in self.per_degree_pch_out_db.keys() \
+            else self.params.target_pch_out_db
 
     def update_pref(self, pref):
         return pref._replace(p_span0=pref.p_span0, p_spani=self.effective_pch_out_db)
 
     def __call__(self, spectral_info, degree):
-        carriers = tuple(self.propagate(spectral_info.pref, *spectral_info.carriers, degree=degree))
-        pref = self.update_pref(spectral_info.pref)
-        return spectral_info._replace(carriers=carriers, pref=pref)
+        pref = spectral_info.pref
+        propagated_info = self.propagate(spectral_info, degree=degree)
+        propagated_info = propagated_info._replace(pref=self.update_pref(pref))
+        if spectral_info.scenarios is not None:
+            # the ROADM then describes the last scenario, as after successive propagations
+            self.effective_pch_out_db = min(pref.p_spani[-1], self._per_degree_pch(degree))
+            self.effective_loss = pref.p_spani[-1] - self.effective_pch_out_db
+        return propagated_info
 
 
 FusedParams = namedtuple('FusedParams', 'loss')
@@ -288,23 +348,19 @@ class Fused(_Node):
         return '\n'.join([f'{type(self).__name__} {self.uid}',
                           f'  loss (dB): {self.loss:.2f}'])
 
-    def propagate(self, *carriers):
+    def propagate(self, spectral_info):
         attenuation = db2lin(self.loss)
 
-        for carrier in carriers:
-            pwr = carrier.power
-            pwr = pwr._replace(signal=pwr.signal / attenuation,
-                               nli=pwr.nli / attenuation,
-                               ase=pwr.ase / attenuation)
-            yield carrier._replace(power=pwr)
+        return spectral_info._replace(signal=spectral_info.signal / attenuation,
+                                      nli=spectral_info.nli / attenuation,
+                                      ase=spectral_info.ase / attenuation)
 
     def update_pref(self, pref):
         return pref._replace(p_span0=pref.p_span0, p_spani=pref.p_spani - self.loss)
 
     def __call__(self, spectral_info):
-        carriers = tuple(self.propagate(*spectral_info.carriers))
-        pref = self.update_pref(spectral_info.pref)
-        return spectral_info._replace(carriers=carriers, pref=pref)
+        propagated_info = self.propagate(spectral_info)
+        return propagated_info._replace(pref=self.update_pref(spectral_info.pref))
 
 
 class Fiber(_Node):
@@ -416,61 +472,44 @@ class Fiber(_Node):
         :return: carrier_nli: the amount of nonlinear interference in W on the under analysis
         """
 
-        g_nli = 0
-        for interfering_carrier in carriers:
-            psi = _psi(carrier, interfering_carrier, beta2=self.params.beta2,
-                       asymptotic_length=self.params.asymptotic_length)
-            g_nli += (interfering_carrier.power.signal / interfering_carrier.baud_rate)**2 \
-                * (carrier.power.signal / carrier.baud_rate) * psi
-
-        g_nli *= (16 / 27) * (self.params.gamma * self.params.effective_length)**2 \
-            / (2 * pi * abs(self.params.beta2) * self.params.asymptotic_length)
-
-        carrier_nli = carrier.baud_rate * g_nli
-        return carrier_nli
+        return gn_analytic_nli((carrier,), carriers, self.params)[0]
 
-    def propagate(self, *carriers):
-        r"""Generator that computes the fiber propagation: attenuation, non-linear interference generation, CD
-        accumulation and PMD accumulation.
+    def propagate(self, spectral_info):
+        """Computes the fiber propagation of all the channels at once: attenuation, non-linear interference
+        generation, CD accumulation and PMD accumulation.
 
-        :param: \*carriers: the channels at the input of the fiber
-        :yield: carrier: the next channel at the output of the fiber
+        :param spectral_info: the channels at the input of the fiber
+        :return: the channels at the output of the fiber
         """
 
         # apply connector_att_in on all carriers before computing gn analytics  premiere partie pas bonne
         attenuation = db2lin(self.params.con_in + self.params.att_in)
-
-        chan = []
-        for carrier in carriers:
-            pwr = carrier.power
-            pwr = pwr._replace(signal=pwr.signal / attenuation,
-                               nli=pwr.nli / attenuation,
-                               ase=pwr.ase / attenuation)
-            carrier = carrier._replace(power=pwr)
-            chan.append(carrier)
-
-        carriers = tuple(f for f in chan)
+        spectral_info = spectral_info._replace(signal=spectral_info.signal / attenuation,
+                                               nli=spectral_info.nli / attenuation,
+                                               ase=spectral_info.ase / attenuation)
 
         # propagate in the fiber and apply attenuation out
         attenuation = db2lin(self.params.con_out)
-        for carrier in carriers:
-            pwr = carrier.power
-            carrier_nli = self._gn_analytic(carrier, *carriers)
-            pwr = pwr._replace(signal=pwr.signal / self.params.lin_attenuation / attenuation,
-                               nli=(pwr.nli + carrier_nli) / self.params.lin_attenuation / attenuation,
-                               ase=pwr.ase / self.params.lin_attenuation / attenuation)
-            chromatic_dispersion = carrier.chromatic_dispersion + self.chromatic_dispersion(carrier.frequency)
-            pmd = sqrt(carrier.pmd**2 + self.pmd**2)
-            yield carrier._replace(power=pwr, chromatic_dispersion=chromatic_dispersion, pmd=pmd)
+        carriers_nli = nli_cache.spectral_nli(self, spectral_info,
+                                              lambda: spectral_gn_analytic_nli(spectral_info, self.params))
+        return spectral_info._replace(
+            signal=spectral_info.signal / self.params.lin_attenuation / attenuation,
+            nli=(spectral_info.nli + carriers_nli) / self.params.lin_attenuation / attenuation,
+            ase=spectral_info.ase / self.params.lin_attenuation / attenuation,
+            chromatic_dispersion=spectral_info.chromatic_dispersion +
+            self.chromatic_dispersion(spectral_info.frequency),
+            pmd=sqrt(spectral_info.pmd**2 + self.pmd**2))
 
     def update_pref(self, pref):
-        self.pch_out_db = round(pref.p_spani - self.loss, 2)
+        self.pch_out_db = _round(pref.p_spani - self.loss, 2)
         return pref._replace(p_span0=pref.p_span0, p_spani=self.pch_out_db)
 
     def __call__(self, spectral_info):
-        carriers = tuple(self.propagate(*spectral_info.carriers))
-        pref = self.update_pref(spectral_info.pref)
-        return spectral_info._replace(carriers=carriers, pref=pref)
+        propagated_info = self.propagate(spectral_info)
+        propagated_info = propagated_info._replace(pref=self.update_pref(spectral_info.pref))
+        if spectral_info.scenarios is not None:
+            _keep_last_scenario(self, 'pch_out_db')
+        return propagated_info
 
 
 class RamanFiber(Fiber):
@@ -487,23 +526,24 @@ class RamanFiber(Fiber):
     def to_json(self):
         return dict(super().to_json, operational=self.operational)
 
-    def update_pref(self, pref, *carriers):
-        pch_out_db = lin2db(mean([carrier.power.signal for carrier in carriers])) + 30
+    def update_pref(self, pref, spectral_info):
+        pch_out_db = lin2db(mean(spectral_info.signal)) + 30
         self.pch_out_db = round(pch_out_db, 2)
         return pref._replace(p_span0=pref.p_span0, p_spani=self.pch_out_db)
 
     def __call__(self, spectral_info):
-        carriers = tuple(self.propagate(*spectral_info.carriers))
-        pref = self.update_pref(spectral_info.pref, *carriers)
-        return spectral_info._replace(carriers=carriers, pref=pref)
+        if spectral_info.scenarios is not None:
+            return _propagate_scenarios(self, spectral_info)
+        propagated_info = self.propagate(spectral_info)
+        return propagated_info._replace(pref=self.update_pref(spectral_info.pref, propagated_info))
 
-    def propagate(self, *carriers):
-        for propagated_carrier in propagate_raman_fiber(self, *carriers):
-            chromatic_dispersion = propagated_carrier.chromatic_dispersion + \
-                                   self.chromatic_dispersion(propagated_carrier.frequency)
-            pmd = sqrt(propagated_carrier.pmd**2 + self.pmd**2)
-            propagated_carrier = propagated_carrier._replace(chromatic_dispersion=chromatic_dispersion, pmd=pmd)
-            yield propagated_carrier
+    def propagate(self, spectral_info):
+        # the Raman and NLI solvers work on the carriers view of the channels
+        spectral_info = spectral_info._replace(carriers=propagate_raman_fiber(self, *spectral_info.carriers))
+        return spectral_info._replace(
+            chromatic_dispersion=spectral_info.chromatic_dispersion +
+            self.chromatic_dispersion(spectral_info.frequency),
+            pmd=sqrt(spectral_info.pmd**2 + self.pmd**2))
 
 
 class EdfaParams:
@@ -644,21 +684,23 @@ class Edfa(_Node):
         self.interpol_nf_ripple = interp(self.channel_freq, amplifier_freq, self.params.nf_ripple)
 
         self.nch = frequencies.size
-        self.pin_db = lin2db(sum(pin * 1e3))
+        # with several scenarios, pin has one row per scenario and the fields of pref one value per scenario
+        self.pin_db = lin2db(sum(pin * 1e3, axis=-1))
 
         """in power mode: delta_p is defined and can be used to calculate the power target
         This power target is used calculate the amplifier gain"""
         if self.delta_p is not None:
-            self.target_pch_out_db = round(self.delta_p + pref.p_span0, 2)
+            self.target_pch_out_db = _round(self.delta_p + pref.p_span0, 2)
             self.effective_gain = self.target_pch_out_db - pref.p_spani
 
         """check power saturation and correct effective gain & power accordingly:"""
-        self.effective_gain = min(
-            self.effective_gain,
-            self.params.p_max - (pref.p_spani + pref.neq_ch)
-        )
+        max_gain = self.params.p_max - (pref.p_spani + pref.neq_ch)
+        if self.delta_p is None and ndim(max_gain):
+            # in gain mode a saturated gain is kept by the next scenarios, as after successive propagations
+            max_gain = minimum.accumulate(max_gain)
+        self.effective_gain = _minimum(self.effective_gain, max_gain)
         #print(self.uid, self.effective_gain, self.operational.gain_target)
-        self.effective_pch_out_db = round(pref.p_spani + self.effective_gain, 2)
+        self.effective_pch_out_db = _round(pref.p_spani + self.effective_gain, 2)
 
         """check power saturation and correct target_gain accordingly:"""
         #print(self.uid, self.effective_gain, self.pin_db, pref.p_spani)
@@ -666,16 +708,16 @@ class Edfa(_Node):
         self.gprofile = self._gain_profile(pin)
 
         pout = (pin + self.noise_profile(baud_rates)) * db2lin(self.gprofile)
-        self.pout_db = lin2db(sum(pout * 1e3))
+        self.pout_db = lin2db(sum(pout * 1e3, axis=-1))
         # ase & nli are only calculated in signal bandwidth
         #    pout_db is not the absolute full output power (negligible if sufficient channels)
 
     def _nf(self, type_def, nf_model, nf_fit_coeff, gain_min, gain_flatmax, gain_target):
         # if hybrid raman, use edfa_gain_flatmax attribute, else use gain_flatmax
         #gain_flatmax = getattr(params, 'edfa_gain_flatmax', params.gain_flatmax)
-        pad = max(gain_min - gain_target, 0)
-        gain_target += pad
-        dg = max(gain_flatmax - gain_target, 0)
+        pad = _maximum(gain_min - gain_target, 0)
+        gain_target = gain_target + pad
+        dg = _maximum(gain_flatmax - gain_target, 0)
         if type_def == 'variable_gain':
             g1a = gain_target - nf_model.delta_p - dg
             nf_avg = lin2db(db2lin(nf_model.nf1) + db2lin(nf_model.nf2) / db2lin(g1a))
@@ -688,7 +730,7 @@ class Edfa(_Node):
         elif type_def == 'openroadm_preamp':
             pin_ch = self.pin_db - lin2db(self.nch)
             # model OSNR = f(Pin)
-            nf_avg = pin_ch - min((4 * pin_ch + 275) / 7, 33) + 58
+            nf_avg = pin_ch - _minimum((4 * pin_ch + 275) / 7, 33) + 58
         elif type_def == 'openroadm_booster':
             # model a zero-noise amp with "infinitely negative" (in dB) NF
             nf_avg = float('-inf')
@@ -732,7 +774,7 @@ class Edfa(_Node):
         if avg:
             return nf_avg
         else:
-            return self.interpol_nf_ripple + nf_avg  # input VOA = 1 for 1 NF degradation
+            return self.interpol_nf_ripple + _column(nf_avg)  # input VOA = 1 for 1 NF degradation
 
     def noise_profile(self, df):
         """noise_profile(bw) computes amplifier ASE (W) in signal bandwidth (Hz)
@@ -808,13 +850,16 @@ class Edfa(_Node):
             Ported from Matlab version written by David Boerges at Ciena.
         """
 
+        # with several scenarios, the gains and powers of each scenario are columns broadcast against the channels
+        effective_gain = _column(self.effective_gain)
+
         # TODO|jla: check what param should be used (currently length(dgt))
         if len(self.interpol_dgt) == 1:
-            return array([self.effective_gain])
+            return array([self.effective_gain]).T  # a column of the gain of each scenario
 
         # TODO|jla: find a way to use these or lose them. Primarily we should have
         # a way to determine if exceeding the gain or output power of the amp
-        tot_in_power_db = self.pin_db  # Pin in W
+        tot_in_power_db = _column(self.pin_db)  # Pin in W
 
         # linear fit to get the
         p = polyfit(self.channel_freq, self.interpol_dgt, 1)
@@ -840,18 +885,18 @@ class Edfa(_Node):
         # first estimate of Er gain & VOA loss
         g1st = array(self.interpol_gain_ripple) + self.params.gain_flatmax \
             + array(self.interpol_dgt) * dgts1
-        voa = lin2db(mean(db2lin(g1st))) - self.effective_gain
+        voa = lin2db(mean(db2lin(g1st))) - effective_gain
 
         # second estimate of amp ch gain using the channel input profile
         g2nd = g1st - voa
 
-        pout_db = lin2db(sum(pin * 1e3 * db2lin(g2nd)))
-        dgts2 = self.effective_gain - (pout_db - tot_in_power_db)
+        pout_db = lin2db(sum(pin * 1e3 * db2lin(g2nd), axis=-1, keepdims=pin.ndim > 1))
+        dgts2 = effective_gain - (pout_db - tot_in_power_db)
 
         # center estimate of amp ch gain
         xcent = dgts2
         gcent = g1st - voa + array(self.interpol_dgt) * xcent
-        pout_db = lin2db(sum(pin * 1e3 * db2lin(gcent)))
+        pout_db = lin2db(sum(pin * 1e3 * db2lin(gcent), axis=-1, keepdims=pin.ndim > 1))
         gavg_cent = pout_db - tot_in_power_db
 
         # Lower estimate of amp ch gain
@@ -863,52 +908,47 @@ class Edfa(_Node):
 
         xlow = dgts2 - deltax
         glow = g1st - voa + array(self.interpol_dgt) * xlow
-        pout_db = lin2db(sum(pin * 1e3 * db2lin(glow)))
+        pout_db = lin2db(sum(pin * 1e3 * db2lin(glow), axis=-1, keepdims=pin.ndim > 1))
         gavg_low = pout_db - tot_in_power_db
 
         # upper gain estimate
         xhigh = dgts2 + deltax
         ghigh = g1st - voa + array(self.interpol_dgt) * xhigh
-        pout_db = lin2db(sum(pin * 1e3 * db2lin(ghigh)))
+        pout_db = lin2db(sum(pin * 1e3 * db2lin(ghigh), axis=-1, keepdims=pin.ndim > 1))
         gavg_high = pout_db - tot_in_power_db
 
         # compute slope
         slope1 = (gavg_low - gavg_cent) / (xlow - xcent)
         slope2 = (gavg_cent - gavg_high) / (xcent - xhigh)
 
-        if abs(self.effective_gain - gavg_cent) <= err_tolerance:
-            dgts3 = xcent
-        elif self.effective_gain < gavg_cent:
-            dgts3 = xcent - (gavg_cent - self.effective_gain) / slope1
-        else:
-            dgts3 = xcent + (-gavg_cent + self.effective_gain) / slope2
+        dgts3 = where(abs(effective_gain - gavg_cent) <= err_tolerance, xcent,
+                      where(effective_gain < gavg_cent, xcent - (gavg_cent - effective_gain) / slope1,
+                            xcent + (-gavg_cent + effective_gain) / slope2))
 
         return g1st - voa + array(self.interpol_dgt) * dgts3
 
-    def propagate(self, pref, *carriers):
+    def propagate(self, spectral_info):
         """add ASE noise to the propagating carriers of :class:`.info.SpectralInformation`"""
-        pin = array([c.power.signal + c.power.nli + c.power.ase for c in carriers])  # pin in W
-        freq = array([c.frequency for c in carriers])
-        brate = array([c.baud_rate for c in carriers])
+        pin = spectral_info.total_power  # pin in W
         # interpolate the amplifier vectors with the carriers freq, calculate nf & gain profile
-        self.interpol_params(freq, pin, brate, pref)
+        self.interpol_params(spectral_info.frequency, pin, spectral_info.baud_rate, spectral_info.pref)
 
         gains = db2lin(self.gprofile)
-        carrier_ases = self.noise_profile(brate)
+        carrier_ases = self.noise_profile(spectral_info.baud_rate)
         att = db2lin(self.out_voa)
 
-        for gain, carrier_ase, carrier in zip(gains, carrier_ases, carriers):
-            pwr = carrier.power
-            pwr = pwr._replace(signal=pwr.signal * gain / att,
-                               nli=pwr.nli * gain / att,
-                               ase=(pwr.ase + carrier_ase) * gain / att)
-            yield carrier._replace(power=pwr)
+        return spectral_info._replace(signal=spectral_info.signal * gains / att,
+                                      nli=spectral_info.nli * gains / att,
+                                      ase=(spectral_info.ase + carrier_ases) * gains / att)
 
     def update_pref(self, pref):
         return pref._replace(p_span0=pref.p_span0,
                              p_spani=pref.p_spani + self.effective_gain - self.out_voa)
 
     def __call__(self, spectral_info):
-        carriers = tuple(self.propagate(spectral_info.pref, *spectral_info.carriers))
-        pref = self.update_pref(spectral_info.pref)
-        return spectral_info._replace(carriers=carriers, pref=pref)
+        propagated_info = self.propagate(spectral_info)
+        propagated_info = propagated_info._replace(pref=self.update_pref(spectral_info.pref))
+        if spectral_info.scenarios is not None:
+            _keep_last_scenario(self, 'pin_db', 'pout_db', 'nf', 'gprofile', 'att_in', 'target_pch_out_db',
+                                'effective_gain', 'effective_pch_out_db')
+        return propagated_info
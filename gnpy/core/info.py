@@ -9,6 +9,7 @@ This module contains classes for modelling :class:`SpectralInformation`.
 """
 
 from collections import namedtuple
+from numpy import arange, array, asarray, full, zeros
 from gnpy.core.utils import automatic_nch, lin2db
 
 
@@ -36,21 +37,230 @@ class Pref(namedtuple('Pref', 'p_span0, p_spani, neq_ch ')):
     neq_ch: equivalent channel count in dB"""
 
 
-class SpectralInformation(namedtuple('SpectralInformation', 'pref carriers')):
+class SpectralInformation(object):
+    """ Class containing the spectral information of a WDM comb, as one array per parameter of the channels, sorted
+    as the channels of the comb. Network elements propagate the whole comb at once with vectorized operations on these
+    arrays, and return a new instance: the arrays are shared between instances and are never modified in place.
 
-    def __new__(cls, pref, carriers):
-        return super().__new__(cls, pref, carriers)
+    Several scenarios of the same channel plan, e.g. the launch powers of a power sweep, can be propagated at once: the
+    powers, CD and PMD then have a leading scenario axis, of shape (scenarios, channels), and the fields of pref are
+    arrays of one value per scenario.
+
+        :param pref (gnpy.core.info.Pref): noiseless reference power (dBm)
+        :param channel_number: channel number of each channel in the WDM grid
+        :param frequency: central frequency of each channel (Hz)
+        :param baud_rate: symbol rate of each channel (Baud)
+        :param roll_off: roll off of each channel. It is a pure number between 0 and 1
+        :param signal: signal power of each channel (W)
+        :param nli: NLI power of each channel (W)
+        :param ase: ASE noise power of each channel (W)
+        :param chromatic_dispersion: chromatic dispersion of each channel (s/m)
+        :param pmd: polarization mode dispersion of each channel (s)
+        :param carriers: sequence of gnpy.core.info.Channel, instead of the arrays of the channel parameters
+
+    For compatibility with the former (pref, carriers) named tuple, SpectralInformation(pref, carriers) builds the
+    spectral information of the carriers and unpacking it gives pref and carriers.
+    """
+
+    _fields = ('pref', 'channel_number', 'frequency', 'baud_rate', 'roll_off', 'signal', 'nli', 'ase',
+               'chromatic_dispersion', 'pmd')
+    __slots__ = tuple(f'_{field}' for field in _fields) + ('_carriers',)
+
+    def __init__(self, pref, channel_number=None, frequency=None, baud_rate=None, roll_off=None, signal=None,
+                 nli=None, ase=None, chromatic_dispersion=None, pmd=None, carriers=None):
+        if carriers is None and frequency is None:
+            # former SpectralInformation(pref, carriers)
+            carriers = channel_number
+        if carriers is not None:
+            channel_number, frequency, baud_rate, roll_off, chromatic_dispersion, pmd = \
+                ([getattr(c, field) for c in carriers] for field in ('channel_number', 'frequency', 'baud_rate',
+                                                                     'roll_off', 'chromatic_dispersion', 'pmd'))
+            signal, nli, ase = ([getattr(c.power, field) for c in carriers] for field in ('signal', 'nli', 'ase'))
+        self._pref = pref
+        self._channel_number = asarray(channel_number, dtype=int)
+        self._frequency = asarray(frequency, dtype=float)
+        self._baud_rate = asarray(baud_rate, dtype=float)
+        self._roll_off = asarray(roll_off, dtype=float)
+        self._signal = asarray(signal, dtype=float)
+        self._nli = asarray(nli, dtype=float)
+        self._ase = asarray(ase, dtype=float)
+        self._chromatic_dispersion = asarray(chromatic_dispersion, dtype=float)
+        self._pmd = asarray(pmd, dtype=float)
+        self._carriers = None
+
+    @classmethod
+    def from_carriers(cls, pref, carriers):
+        """ Builds the spectral information of a sequence of gnpy.core.info.Channel"""
+        return cls(pref=pref, carriers=carriers)
+
+    @property
+    def pref(self):
+        return self._pref
+
+    @property
+    def channel_number(self):
+        return self._channel_number
+
+    @property
+    def frequency(self):
+        return self._frequency
+
+    @property
+    def baud_rate(self):
+        return self._baud_rate
+
+    @property
+    def roll_off(self):
+        return self._roll_off
+
+    @property
+    def signal(self):
+        return self._signal
+
+    @property
+    def nli(self):
+        return self._nli
+
+    @property
+    def ase(self):
+        return self._ase
+
+    @property
+    def chromatic_dispersion(self):
+        return self._chromatic_dispersion
+
+    @property
+    def pmd(self):
+        return self._pmd
+
+    @property
+    def total_power(self):
+        """signal, NLI and ASE power of each channel (W)"""
+        return self._signal + self._nli + self._ase
+
+    @property
+    def scenarios(self):
+        """number of scenarios propagated at once, None for a single spectral information"""
+        return self._signal.shape[0] if self._signal.ndim == 2 else None
+
+    def scenario(self, index):
+        """ Returns the spectral information of one of the scenarios"""
+        return SpectralInformation(pref=Pref(*(value[index] for value in self.pref)),
+                                   **{field: getattr(self, field)[index] if getattr(self, field).ndim == 2
+                                      else getattr(self, field) for field in self._fields[1:]})
+
+    @classmethod
+    def stack(cls, spectral_infos):
+        """ Builds the spectral information of several scenarios of the same channel plan, one per spectral
+        information of the sequence
+        """
+        first = spectral_infos[0]
+        return cls(pref=Pref(*(array(values) for values in zip(*(si.pref for si in spectral_infos)))),
+                   channel_number=first.channel_number, frequency=first.frequency, baud_rate=first.baud_rate,
+                   roll_off=first.roll_off,
+                   **{field: array([getattr(si, field) for si in spectral_infos])
+                      for field in ('signal', 'nli', 'ase', 'chromatic_dispersion', 'pmd')})
+
+    @property
+    def carriers(self):
+        """ Compatibility view of the channels as a tuple of gnpy.core.info.Channel, built on first access"""
+        if self.scenarios is not None:
+            raise ValueError(f'The carriers of a {type(self).__name__} of several scenarios are ambiguous, select one '
+                             f'of its scenarios')
+        if self._carriers is None:
+            self._carriers = tuple(
+                Channel(channel_number, frequency, baud_rate, roll_off, Power(signal, nli, ase),
+                        chromatic_dispersion, pmd)
+                for channel_number, frequency, baud_rate, roll_off, signal, nli, ase, chromatic_dispersion, pmd
+                in zip(*(getattr(self, field).tolist() for field in self._fields[1:])))
+        return self._carriers
+
+    def _replace(self, **kwargs):
+        """ Returns a new spectral information with the given fields replaced, either arrays of the channel parameters,
+        the pref or a sequence of gnpy.core.info.Channel as carriers
+        """
+        if 'carriers' in kwargs:
+            spectral_info = self.from_carriers(kwargs.pop('pref', self.pref), kwargs.pop('carriers'))
+            return spectral_info._replace(**kwargs) if kwargs else spectral_info
+        self._check_fields(kwargs)
+        return type(self)(**{field: kwargs.get(field, getattr(self, field)) for field in self._fields})
+
+    def _check_fields(self, fields):
+        unknown_fields = set(fields) - set(self._fields)
+        if unknown_fields:
+            raise TypeError(f'Unknown fields of {type(self).__name__}: {", ".join(sorted(unknown_fields))}')
+
+    def snapshot(self):
+        """ Returns a spectral information that later propagations leave unchanged: the spectral information
+        itself, its arrays are never modified in place
+        """
+        return self
+
+    def __iter__(self):
+        """ Unpacks as the former (pref, carriers) named tuple"""
+        return iter((self.pref, self.carriers))
+
+    def __repr__(self):
+        scenarios = '' if self.scenarios is None else f', number of scenarios={self.scenarios}'
+        return f'{type(self).__name__}(pref={self.pref!r}, number of channels={len(self._frequency)}{scenarios})'
+
+
+class SpectralInformationBuffer(SpectralInformation):
+    """ Working buffer of spectral information, allocated once for a propagation through a path and transformed in
+    place by the network elements: _replace writes the new values into the arrays of the buffer and returns the buffer
+    itself, instead of a new spectral information. As the next element overwrites these arrays, the spectral
+    information at the output of a given element is recorded with snapshot.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self._fields[1:]:
+            setattr(self, f'_{field}', getattr(self, field).copy())
+
+    @classmethod
+    def from_spectral_information(cls, spectral_info):
+        """ Allocates a buffer initialized with a copy of a spectral information"""
+        return cls(**{field: getattr(spectral_info, field) for field in cls._fields})
+
+    def _replace(self, **kwargs):
+        """ Writes the given fields into the buffer, either arrays of the channel parameters, the pref or a sequence of
+        gnpy.core.info.Channel as carriers, and returns the buffer
+        """
+        if 'carriers' in kwargs:
+            spectral_info = SpectralInformation.from_carriers(kwargs.pop('pref', self.pref), kwargs.pop('carriers'))
+            kwargs = dict({field: getattr(spectral_info, field) for field in self._fields}, **kwargs)
+        self._check_fields(kwargs)
+        for field, value in kwargs.items():
+            if field == 'pref':
+                self._pref = value
+            else:
+                getattr(self, field)[...] = value
+        self._carriers = None
+        return self
+
+    def snapshot(self):
+        """ Returns a copy of the current content of the buffer, that later propagations leave unchanged"""
+        return SpectralInformation(**{field: getattr(self, field) if field == 'pref' else getattr(self, field).copy()
+                                      for field in self._fields})
 
 
 def create_input_spectral_information(f_min, f_max, roll_off, baud_rate, power, spacing):
     # pref in dB : convert power lin into power in dB
     pref = lin2db(power * 1e3)
     nb_channel = automatic_nch(f_min, f_max, spacing)
+    channel_number = arange(1, nb_channel + 1)
     si = SpectralInformation(
         pref=Pref(pref, pref, lin2db(nb_channel)),
-        carriers=[
-            Channel(f, (f_min + spacing * f),
-                    baud_rate, roll_off, Power(power, 0, 0), 0, 0) for f in range(1, nb_channel + 1)
-        ]
+        channel_number=channel_number,
+        frequency=f_min + spacing * channel_number,
+        baud_rate=full(nb_channel, baud_rate),
+        roll_off=full(nb_channel, roll_off),
+        signal=full(nb_channel, power),
+        nli=zeros(nb_channel),
+        ase=zeros(nb_channel),
+        chromatic_dispersion=zeros(nb_channel),
+        pmd=zeros(nb_channel)
     )
     return si
@@ -50,6 +50,10 @@ class RamanParams(Parameters):
         self._flag_raman = kwargs['flag_raman']
         self._space_resolution = kwargs['space_resolution'] if 'space_resolution' in kwargs else None
         self._tolerance = kwargs['tolerance'] if 'tolerance' in kwargs else None
+        self._warm_start_tolerance = kwargs['warm_start_tolerance'] if 'warm_start_tolerance' in kwargs else None
+        self._spectral_bin_width = kwargs['spectral_bin_width'] if 'spectral_bin_width' in kwargs else None
+        self._adaptive_mesh_tolerance = kwargs['adaptive_mesh_tolerance'] \
+            if 'adaptive_mesh_tolerance' in kwargs else None
 
     @property
     def flag_raman(self):
@@ -63,6 +67,18 @@ class RamanParams(Parameters):
     def tolerance(self):
         return self._tolerance
 
+    @property
+    def warm_start_tolerance(self):
+        return self._warm_start_tolerance
+
+    @property
+    def spectral_bin_width(self):
+        return self._spectral_bin_width
+
+    @property
+    def adaptive_mesh_tolerance(self):
+        return self._adaptive_mesh_tolerance
+
 
 class NLIParams(Parameters):
     def __init__(self, **kwargs):
@@ -70,9 +86,13 @@ class NLIParams(Parameters):
         self._wdm_grid_size = kwargs['wdm_grid_size']
         self._dispersion_tolerance = kwargs['dispersion_tolerance']
         self._phase_shift_tolerance = kwargs['phase_shift_tolerance']
-        self._f_cut_resolution = None
-        self._f_pump_resolution = None
         self._computed_channels = kwargs['computed_channels'] if 'computed_channels' in kwargs else None
+        self._computed_channels_tolerance = kwargs['computed_channels_tolerance'] \
+            if 'computed_channels_tolerance' in kwargs else None
+        self._xpm_cache_tolerance = kwargs['xpm_cache_tolerance'] if 'xpm_cache_tolerance' in kwargs else None
+        self._workers = kwargs['workers'] if 'workers' in kwargs else None
+        self._integration_method = kwargs['integration_method'] if 'integration_method' in kwargs else None
+        self._integration_tolerance = kwargs['integration_tolerance'] if 'integration_tolerance' in kwargs else None
 
     @property
     def nli_method_name(self):
@@ -91,24 +111,28 @@ class NLIParams(Parameters):
         return self._phase_shift_tolerance
 
     @property
-    def f_cut_resolution(self):
-        return self._f_cut_resolution
+    def computed_channels(self):
+        return self._computed_channels
+
+    @property
+    def computed_channels_tolerance(self):
+        return self._computed_channels_tolerance
 
-    @f_cut_resolution.setter
-    def f_cut_resolution(self, f_cut_resolution):
-        self._f_cut_resolution = f_cut_resolution
+    @property
+    def xpm_cache_tolerance(self):
+        return self._xpm_cache_tolerance
 
     @property
-    def f_pump_resolution(self):
-        return self._f_pump_resolution
+    def workers(self):
+        return self._workers
 
-    @f_pump_resolution.setter
-    def f_pump_resolution(self, f_pump_resolution):
-        self._f_pump_resolution = f_pump_resolution
+    @property
+    def integration_method(self):
+        return self._integration_method
 
     @property
-    def computed_channels(self):
-        return self._computed_channels
+    def integration_tolerance(self):
+        return self._integration_tolerance
 
 
 class SimParams(Parameters):
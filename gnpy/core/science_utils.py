@@ -10,19 +10,35 @@ Solver definitions to calculate the Raman effect and the nonlinear interference
 The solvers take as input instances of the spectral information, the fiber and the simulation parameters
 """
 
-from numpy import interp, pi, zeros, shape, where, cos, reshape, array, append, ones, argsort, nan, exp, arange, sqrt, \
-    empty, vstack, trapz, arcsinh, clip, abs, sum
+from numpy.polynomial.legendre import leggauss
+from numpy import interp, pi, zeros, where, cos, reshape, array, append, ones, argsort, exp, arange, sqrt, \
+    empty, outer, triu, tril, diag, trapz, arcsinh, clip, abs, sum, newaxis, diff, asarray, rint, argmin, minimum, \
+    unique, meshgrid, prod, repeat, ceil, log2, concatenate, ndarray, einsum, maximum, log, searchsorted, isin, \
+    triu_indices, linspace, subtract, broadcast_to
+from numpy.linalg import solve
+from numpy import load as load_arrays, savez
 from operator import attrgetter
+from itertools import count
+from pickle import dump, load
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from collections import namedtuple, OrderedDict
 from logging import getLogger
 import scipy.constants as ph
-from scipy.integrate import solve_bvp
+from scipy.integrate import solve_bvp, solve_ivp
 from scipy.integrate import cumtrapz
 from scipy.interpolate import interp1d
 from scipy.optimize import OptimizeResult
 from math import isclose
+from hashlib import sha256
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from zipfile import BadZipFile
+import os
 
 from gnpy.core.utils import db2lin, lin2db
 from gnpy.core.exceptions import EquipmentConfigError
+from gnpy.core.parameters import Parameters, PumpParams
 
 logger = getLogger(__name__)
 
@@ -65,19 +81,54 @@ def propagate_raman_fiber(fiber, *carriers):
     nli_solver = fiber.nli_solver
     nli_solver.stimulated_raman_scattering = stimulated_raman_scattering
 
-    nli_frequencies = []
-    computed_nli = []
-    for carrier in (c for c in carriers if c.channel_number in sim_params.nli_params.computed_channels):
-        resolution_param = frequency_resolution(carrier, carriers, sim_params, fiber)
-        f_cut_resolution, f_pump_resolution, _, _ = resolution_param
-        nli_params.f_cut_resolution = f_cut_resolution
-        nli_params.f_pump_resolution = f_pump_resolution
-        nli_frequencies.append(carrier.frequency)
-        computed_nli.append(nli_solver.compute_nli(carrier, *carriers))
+    channel_numbers = [carrier.channel_number for carrier in carriers]
+    f_resolution = frequency_resolution(fiber, sim_params, max(channel_numbers) - min(channel_numbers))
+
+    def compute_nli():
+        if nli_params.nli_method_name.lower() == 'srs_closed_form':
+            # the closed form is cheap enough to be evaluated on the whole comb at once
+            return srs_closed_form_nli(carriers, carriers, fiber, stimulated_raman_scattering)
+
+        executor = simulation.nli_executor()
+        if executor is not None:
+            # the span data are written once to a file, whose name is sent with the tasks: each worker reads it at
+            # its first task of the span, also across the batches of the adaptive selection of the computed channels
+            span_id = next(_nli_span_ids)
+            with NamedTemporaryFile(prefix='gnpy_nli_span_', suffix='.pickle', delete=False) as file:
+                dump((fiber.params, stimulated_raman_scattering, carriers, f_resolution), file)
+            span = file.name
+            workers = nli_params.workers
+
+        def carriers_nli(cut_carriers):
+            if executor is None:
+                return [nli_solver.compute_nli(carrier, *carriers, f_resolution=f_resolution)
+                        for carrier in cut_carriers]
+            channel_numbers = [carrier.channel_number for carrier in cut_carriers]
+            computed_nli = [None] * len(channel_numbers)
+            for i, chunk_nli in enumerate(executor.map(_nli_worker, [span_id] * workers, [span] * workers,
+                                                       [channel_numbers[i::workers] for i in range(workers)])):
+                computed_nli[i::workers] = chunk_nli
+            return computed_nli
+
+        try:
+            if nli_params.computed_channels_tolerance is None:
+                cut_carriers = [c for c in carriers if c.channel_number in nli_params.computed_channels]
+                nli_frequencies = [carrier.frequency for carrier in cut_carriers]
+                computed_nli = carriers_nli(cut_carriers)
+            else:
+                nli_frequencies, computed_nli = adaptive_computed_nli(carriers, carriers_nli,
+                                                                      nli_params.computed_channels_tolerance,
+                                                                      nli_params.computed_channels,
+                                                                      fiber.raman_pumps)
+        finally:
+            if executor is not None:
+                _unlink(Path(span))
+        return interp([carrier.frequency for carrier in carriers], nli_frequencies, computed_nli)
+
+    carriers_nli = nli_cache.carriers_nli(fiber, carriers, compute_nli, fiber.raman_pumps, raman_params, nli_params)
 
     new_carriers = []
-    for carrier, attenuation, rmn_ase in zip(carriers, fiber_attenuation, raman_ase):
-        carrier_nli = interp(carrier.frequency, nli_frequencies, computed_nli)
+    for carrier, attenuation, rmn_ase, carrier_nli in zip(carriers, fiber_attenuation, raman_ase, carriers_nli):
         pwr = carrier.power
         pwr = pwr._replace(signal=pwr.signal / attenuation / attenuation_out,
                            nli=(pwr.nli + carrier_nli) / attenuation / attenuation_out,
@@ -86,64 +137,498 @@ def propagate_raman_fiber(fiber, *carriers):
     return new_carriers
 
 
-def frequency_resolution(carrier, carriers, sim_params, fiber):
-    def _get_freq_res_k_phi(delta_count, grid_size, alpha0, delta_z, beta2, k_tol, phi_tol):
-        res_phi = _get_freq_res_phase_rotation(delta_count, grid_size, delta_z, beta2, phi_tol)
-        res_k = _get_freq_res_dispersion_attenuation(delta_count, grid_size, alpha0, beta2, k_tol)
-        res_dict = {'res_phi': res_phi, 'res_k': res_k}
-        method = min(res_dict, key=res_dict.get)
-        return res_dict[method], method, res_dict
+_nli_span_ids = count()
+_nli_worker_span = {}
+
+
+class _NliFiber:
+    """ The parameters and the attenuation of a fiber, i.e. all the NLI solver of a worker process needs from it """
+
+    def __init__(self, params):
+        self.params = params
+
+    def alpha(self, frequencies):
+        from gnpy.core.elements import Fiber  # not at the top: gnpy.core.elements imports this module
+        return Fiber.alpha(self, frequencies)
+
+    def alpha0(self, f_ref=193.5e12):
+        from gnpy.core.elements import Fiber
+        return Fiber.alpha0(self, f_ref)
+
+
+def _init_nli_worker(sim_params):
+    """ Initializes a worker process of the NLI executor with the simulation parameters of the run """
+    # a forked worker inherits the executor of the parent process, which it must not shut down
+    Simulation._shared_dict.pop('nli_executor', None)
+    Simulation.set_params(sim_params)
+
+
+def _nli_worker(span_id, span, channel_numbers):
+    """ Computes in a worker process the NLI on the channels `channel_numbers` of the span `span_id`.
+    The span data, i.e. the fiber parameters, SRS solution, WDM comb and frequency resolutions, are read from the
+    file `span` only at the first task of each span received by the worker.
+    """
+    if _nli_worker_span.get('span_id') != span_id:
+        with open(span, 'rb') as file:
+            params, stimulated_raman_scattering, carriers, f_resolution = load(file)
+        nli_solver = NliSolver(_NliFiber(params))
+        nli_solver.stimulated_raman_scattering = stimulated_raman_scattering
+        _nli_worker_span.update(span_id=span_id, nli_solver=nli_solver, carriers=carriers, f_resolution=f_resolution,
+                                channels={carrier.channel_number: carrier for carrier in carriers})
+    return [_nli_worker_span['nli_solver'].compute_nli(_nli_worker_span['channels'][channel_number],
+                                                       *_nli_worker_span['carriers'],
+                                                       f_resolution=_nli_worker_span['f_resolution'])
+            for channel_number in channel_numbers]
+
+
+def raman_on_off_gain(fiber, carriers, pump_powers, pump_frequencies, propagation_directions, workers=None):
+    """ Computes the on-off gain of a batch of Raman pump configurations of a fiber, e.g. to optimize the pump powers.
+    The SRS is solved once without pumps, then for each configuration, possibly warm-started from the previous one
+    according to the raman_parameters. The configurations can be shared among a pool of processes.
+    :param fiber: instance of elements.py/RamanFiber
+    :param carriers: the channels at the fiber input
+    :param pump_powers: power of the pumps of each configuration [W]. numpy ndarray of shape (configurations, pumps)
+    :param pump_frequencies: frequency of the pumps [Hz], either shared by all the configurations (shape (pumps,))
+        or of each configuration (shape (configurations, pumps))
+    :param propagation_directions: 'coprop' or 'counterprop' propagation direction of each pump
+    :param workers: number of processes solving the configurations, all solved in this process if None or 1
+    :return: on-off gain of each carrier at the fiber output for each configuration [dB]. numpy ndarray of shape
+        (configurations, carriers)
+    """
+    pump_powers = asarray(pump_powers, dtype=float)
+    pump_powers = pump_powers.reshape((-1, pump_powers.shape[-1]))
+    pump_frequencies = broadcast_to(pump_frequencies, pump_powers.shape)
+    configurations = [tuple(PumpParams(power, frequency, direction)
+                            for power, frequency, direction in zip(powers, frequencies, propagation_directions))
+                      for powers, frequencies in zip(pump_powers, pump_frequencies)]
+
+    raman_solver = RamanSolver(fiber)
+    rho_off = _carriers_output_rho(raman_solver, carriers, None)
+    if workers is not None and workers > 1:
+        # the span data are sent once to each worker process, the tasks only carry the pump configurations
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_raman_worker,
+                                 initargs=(fiber, carriers, Simulation.get_simulation().sim_params)) as executor:
+            rho_on = list(executor.map(_raman_worker, configurations))
+    else:
+        rho_on = [_carriers_output_rho(raman_solver, carriers, raman_pumps) for raman_pumps in configurations]
+    return lin2db(array(rho_on) ** 2 / rho_off ** 2)
+
+
+def _carriers_output_rho(raman_solver, carriers, raman_pumps):
+    """ Solves the SRS with the given pumps and returns the field attenuation of each carrier at the fiber output"""
+    raman_solver.carriers = carriers
+    raman_solver.raman_pumps = raman_pumps
+    stimulated_raman_scattering = raman_solver.stimulated_raman_scattering
+    rows = searchsorted(stimulated_raman_scattering.frequency, [carrier.frequency for carrier in carriers])
+    return stimulated_raman_scattering.rho[rows, -1]
+
+
+_raman_worker_span = {}
+
 
-    def _get_freq_res_dispersion_attenuation(delta_count, grid_size, alpha0, beta2, k_tol):
-        return k_tol * abs(alpha0) / abs(beta2) / (1 + delta_count) / (4 * pi ** 2 * grid_size)
+def _init_raman_worker(fiber, carriers, sim_params):
+    """ Initializes a worker process of the Raman pump configurations with the data shared by all of them: a Raman
+    solver of the fiber, the WDM comb and the simulation parameters.
+    """
+    Simulation.set_params(sim_params)
+    _raman_worker_span['raman_solver'] = RamanSolver(fiber)
+    _raman_worker_span['carriers'] = carriers
+
+
+def _raman_worker(raman_pumps):
+    """ Solves in a worker process the SRS of the current fiber with the pump configuration `raman_pumps`"""
+    return _carriers_output_rho(_raman_worker_span['raman_solver'], _raman_worker_span['carriers'], raman_pumps)
+
+
+def adaptive_computed_nli(carriers, carriers_nli, tolerance, computed_channels=None, raman_pumps=None):
+    """ Computes the NLI on an adaptive selection of channels, so that the linear interpolation of the NLI
+    of the other carriers is within the relative tolerance.
+    The selection starts from the band edges, the `computed_channels` and the carriers closest to the Raman pumps
+    falling within the band. Every interval between selected channels is bisected as long as the NLI computed on its
+    middle carrier differs from the interpolated one by more than the tolerance. The middle carriers of all the
+    intervals of a bisection level are computed in a single batch.
+    :param carriers: tuple of carrier objects
+    :param carriers_nli: function returning the list of the NLI powers in W of a list of carriers
+    :param tolerance: relative tolerance on the interpolated NLI
+    :param computed_channels: channel numbers initially selected
+    :param raman_pumps: tuple containing pumps characteristics
+    :return: nli_frequencies, computed_nli: frequencies and NLI of the selected channels, sorted by frequency
+    """
+    carriers = sorted(carriers, key=attrgetter('frequency'))
+    frequencies = array([carrier.frequency for carrier in carriers])
+
+    selection = {0, len(carriers) - 1}
+    if computed_channels:
+        selection.update(index for index, carrier in enumerate(carriers) if carrier.channel_number in computed_channels)
+    if raman_pumps:
+        selection.update(int(argmin(abs(frequencies - pump.frequency))) for pump in raman_pumps
+                         if frequencies[0] < pump.frequency < frequencies[-1])
+    selection = sorted(selection)
+    computed = dict(zip(selection, carriers_nli([carriers[index] for index in selection])))
+
+    intervals = list(zip(selection[:-1], selection[1:]))
+    while intervals:
+        intervals = [(left, right) for left, right in intervals if right - left > 1]
+        middles = [(left + right) // 2 for left, right in intervals]
+        computed.update(zip(middles, carriers_nli([carriers[index] for index in middles])))
+        refined_intervals = []
+        for (left, right), middle in zip(intervals, middles):
+            interpolated_nli = interp(frequencies[middle], frequencies[[left, right]],
+                                      [computed[left], computed[right]])
+            if abs(computed[middle] - interpolated_nli) > tolerance * abs(computed[middle]):
+                refined_intervals.extend([(left, middle), (middle, right)])
+        intervals = refined_intervals
+    logger.debug(f'NLI computed on {len(computed)} channels out of {len(carriers)}')
+
+    selection = sorted(computed)
+    return frequencies[selection], [computed[index] for index in selection]
+
+
+class FrequencyResolution(namedtuple('FrequencyResolution', 'f_cut_resolution f_pump_resolution')):
+    """ Frequency resolutions of the GGN integrals in a fiber.
+
+        :param f_cut_resolution: resolution of the integral over the channel under test (Hz). numpy array indexed by
+            the absolute difference between the channel numbers of the pump and of the channel under test
+        :param f_pump_resolution: resolution of the integral over the pump channel (Hz)
+    """
 
-    def _get_freq_res_phase_rotation(delta_count, grid_size, delta_z, beta2, phi_tol):
-        return phi_tol / abs(beta2) / (1 + delta_count) / delta_z / (4 * pi ** 2 * grid_size)
 
+def frequency_resolution(fiber, sim_params, max_delta_count):
+    """ Plans the frequency resolutions of the GGN integrals in a fiber, for all the channel number differences up to
+    max_delta_count, as the finest between the dispersion-attenuation and the phase rotation requirements.
+    The resolutions are passed to NliSolver.compute_nli instead of being stored in the simulation parameters.
+    :param fiber: instance of elements.py/Fiber
+    :param sim_params: instance of parameters.py/SimParams
+    :param max_delta_count: maximum absolute difference between the channel numbers of the WDM comb
+    :return: FrequencyResolution
+    """
     grid_size = sim_params.nli_params.wdm_grid_size
     delta_z = sim_params.raman_params.space_resolution
     alpha0 = fiber.alpha0()
     beta2 = fiber.params.beta2
     k_tol = sim_params.nli_params.dispersion_tolerance
     phi_tol = sim_params.nli_params.phase_shift_tolerance
-    f_pump_resolution, method_f_pump, res_dict_pump = \
-        _get_freq_res_k_phi(0, grid_size, alpha0, delta_z, beta2, k_tol, phi_tol)
-    f_cut_resolution = {}
-    method_f_cut = {}
-    res_dict_cut = {}
-    for cut_carrier in carriers:
-        delta_number = cut_carrier.channel_number - carrier.channel_number
-        delta_count = abs(delta_number)
-        f_res, method, res_dict = \
-            _get_freq_res_k_phi(delta_count, grid_size, alpha0, delta_z, beta2, k_tol, phi_tol)
-        f_cut_resolution[f'delta_{delta_number}'] = f_res
-        method_f_cut[delta_number] = method
-        res_dict_cut[delta_number] = res_dict
-    return [f_cut_resolution, f_pump_resolution, (method_f_cut, method_f_pump), (res_dict_cut, res_dict_pump)]
-
-
-def raised_cosine_comb(f, *carriers):
+
+    delta_count = arange(max_delta_count + 1)
+    res_phi = phi_tol / abs(beta2) / (1 + delta_count) / delta_z / (4 * pi ** 2 * grid_size)
+    res_k = k_tol * abs(alpha0) / abs(beta2) / (1 + delta_count) / (4 * pi ** 2 * grid_size)
+    f_cut_resolution = minimum(res_phi, res_k)
+    return FrequencyResolution(f_cut_resolution, f_cut_resolution[0])
+
+
+class RaisedCosineShape:
+    """ Normalized raised cosine spectral shape of a carrier, equal to 1 in the pass band.
+    The shape is evaluated in closed form, exactly, with the band limits and the slope coefficient computed once for
+    the given baud rate and roll off: use :func:`raised_cosine_shape` to share the instances among the carriers.
+    """
+
+    def __init__(self, baud_rate, roll_off):
+        self.baud_rate = baud_rate
+        self.roll_off = roll_off
+        self.pass_band = (1 - roll_off) / (2 / baud_rate)
+        self.stop_band = (1 + roll_off) / (2 / baud_rate)
+        self._slope = pi * (1 / baud_rate) / roll_off if roll_off != 0 else None
+
+    def __call__(self, delta_f):
+        """ Returns the shape evaluated at the frequency offsets delta_f from the carrier frequency
+        :param delta_f: numpy array of frequency offsets in Hz
+        :return: normalized PSD evaluated over delta_f
+        """
+        ff = abs(delta_f)
+        tf = ff - self.pass_band
+        if self._slope is None:
+            return where(tf <= 0, 1., 0.)
+        return where(tf <= 0, 1., where(ff <= self.stop_band, 1 / 2 * (1 + cos(self._slope * tf)), 0.))
+
+    def breakpoints(self, positive=False):
+        """ Returns the frequency offsets delimiting the pieces of the shape, where its derivatives are discontinuous
+        :param positive: if True, only the non-negative offsets are returned
+        :return: sorted numpy array of frequency offsets in Hz
+        """
+        edges = unique([0., self.pass_band, self.stop_band]) if positive else \
+            unique([-self.stop_band, -self.pass_band, self.pass_band, self.stop_band])
+        return edges
+
+
+@lru_cache(maxsize=64)
+def raised_cosine_shape(baud_rate, roll_off):
+    """ Returns the :class:`RaisedCosineShape` of the given baud rate and roll off, the same instance being shared by
+    the carriers of the recently used shapes. Nothing is tabulated: sharing only saves the computation of the band
+    limits and the slope of the shape.
+    """
+    return RaisedCosineShape(baud_rate, roll_off)
+
+
+def gauss_legendre_quadrature(integrand, *breakpoints, tolerance=1e-3, order=6, max_refinements=12):
+    """ Integrates a function over the hyper-rectangle defined by the breakpoints with an adaptive tensor product
+    Gauss-Legendre cubature. The cells delimited by the breakpoints are recursively halved along each dimension where
+    the integral over the halves differs from the one over the whole cell by more than the share of the relative
+    tolerance of the cell volume. All the cells of a refinement are evaluated with a single integrand call.
+    :param integrand: vectorized function of one numpy array of coordinates per dimension, all of the same shape
+    :param breakpoints: one sorted sequence per dimension, including the integration limits and the points where
+        the integrand is not smooth
+    :param tolerance: relative tolerance on the integral
+    :param order: number of Gauss-Legendre nodes per dimension of each cell
+    :param max_refinements: maximum number of halvings of the cells
+    :return: integral, number of integrand evaluations
+    """
+    dimensions = len(breakpoints)
+    nodes, weights = leggauss(order)
+    # tensor product rule on the [-1, 1] hypercube
+    cube_nodes = array([node.ravel() for node in meshgrid(*[nodes] * dimensions, indexing='ij')])
+    cube_weights = prod(meshgrid(*[weights] * dimensions, indexing='ij'), axis=0).ravel()
+    # lower corners of the children of a cell, in units of the children width
+    children = array([child.ravel() for child in meshgrid(*[[0., 1.]] * dimensions, indexing='ij')]).T
+
+    def cells_integral(lower, width):
+        coordinates = lower[:, :, newaxis] + width[:, :, newaxis] * (cube_nodes + 1) / 2
+        values = integrand(*coordinates.transpose(1, 0, 2))
+        return (values @ cube_weights) * prod(width / 2, axis=1), values.size
+
+    edges = meshgrid(*[asarray(b, dtype=float) for b in breakpoints], indexing='ij')
+    lower = array([edge[tuple(slice(0, -1) for _ in range(dimensions))].ravel() for edge in edges]).T
+    upper = array([edge[tuple(slice(1, None) for _ in range(dimensions))].ravel() for edge in edges]).T
+    width = upper - lower
+    volume = prod(width, axis=1).sum()
+    estimate, evaluations = cells_integral(lower, width)
+    integral = 0.
+    for _ in range(max_refinements):
+        child_width = repeat(width / 2, len(children), axis=0)
+        child_lower = repeat(lower, len(children), axis=0) + children[newaxis, :, :].repeat(len(lower), axis=0) \
+            .reshape(-1, dimensions) * child_width
+        child_estimate, child_evaluations = cells_integral(child_lower, child_width)
+        evaluations += child_evaluations
+        refined_estimate = child_estimate.reshape(-1, len(children)).sum(axis=1)
+        total = integral + refined_estimate.sum()
+        error = abs(refined_estimate - estimate)
+        converged = error <= tolerance * abs(total) * prod(width, axis=1) / volume
+        integral += refined_estimate[converged].sum()
+        active = repeat(~converged, len(children))
+        lower, width, estimate = child_lower[active], child_width[active], child_estimate[active]
+        if not len(lower):
+            return integral, evaluations
+    logger.warning(f'Gauss-Legendre quadrature not converged within the relative tolerance {tolerance} '
+                   f'after {max_refinements} refinements')
+    return integral + estimate.sum(), evaluations
+
+
+def raised_cosine_comb(f, *carriers, normalized=False, max_chunk_size=2**20):
     """ Returns an array storing the PSD of a WDM comb of raised cosine shaped
     channels at the input frequencies defined in array f
+    The carriers sharing baud rate and roll off are evaluated together with their shared
+    :class:`RaisedCosineShape`, in chunks of f so that the (f x carriers) working arrays
+    hold at most max_chunk_size elements.
     :param f: numpy array of frequencies in Hz
     :param carriers: namedtuple describing the WDM comb
+    :param normalized: if True, the shape of each carrier is not scaled by its PSD, i.e. it is equal to 1 in the
+        pass band
+    :param max_chunk_size: maximum number of elements of the working arrays
     :return: PSD of the WDM comb evaluated over f
     """
-    psd = zeros(shape(f))
+    f = asarray(f, dtype=float)
+    groups = {}
     for carrier in carriers:
-        f_nch = carrier.frequency
-        g_ch = carrier.power.signal / carrier.baud_rate
-        ts = 1 / carrier.baud_rate
-        pass_band = (1 - carrier.roll_off) / (2 / carrier.baud_rate)
-        stop_band = (1 + carrier.roll_off) / (2 / carrier.baud_rate)
-        ff = abs(f - f_nch)
-        tf = ff - pass_band
-        if carrier.roll_off == 0:
-            psd = where(tf <= 0, g_ch, 0.) + psd
-        else:
-            psd = g_ch * (where(tf <= 0, 1., 0.) + 1 / 2 * (1 + cos(pi * ts / carrier.roll_off * tf)) *
-                          where(tf > 0, 1., 0.) * where(abs(ff) <= stop_band, 1., 0.)) + psd
-    return psd
+        groups.setdefault((carrier.baud_rate, carrier.roll_off), []).append(carrier)
+
+    samples = f.reshape(-1)
+    psd = zeros(samples.shape)
+    for (baud_rate, roll_off), group in groups.items():
+        carrier_shape = raised_cosine_shape(baud_rate, roll_off)
+        f_nch = array([carrier.frequency for carrier in group])
+        g_ch = ones(len(group)) if normalized else array([carrier.power.signal / carrier.baud_rate
+                                                           for carrier in group])
+        chunk_length = max(1, max_chunk_size // len(group))
+        for start in range(0, samples.size, chunk_length):
+            psd[start:start + chunk_length] += \
+                carrier_shape(samples[start:start + chunk_length, newaxis] - f_nch) @ g_ch
+    return psd.reshape(f.shape)
+
+
+class NliCache:
+    """ LRU memoization of the NLI generated in the fiber spans, shared by all the propagations: e.g. the requests of
+    a service file crossing the same spans with the same channel plan and launch powers compute their NLI only once.
+    The entries are keyed on the fiber parameters, the channel plan and the signal powers at the fiber input, quantized
+    with a step of power_quantum_db, plus any other parameter the NLI depends on.
+    The cache is disabled as long as max_size is 0.
+    """
+
+    def __init__(self, max_size=0, power_quantum_db=1e-6):
+        self.max_size = max_size
+        self.power_quantum_db = power_quantum_db
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, fiber, carriers, *parameters):
+        return self._key(fiber, [c.channel_number for c in carriers], [c.frequency for c in carriers],
+                         [c.baud_rate for c in carriers], [c.roll_off for c in carriers],
+                         [c.power.signal for c in carriers], parameters)
+
+    def spectral_key(self, fiber, spectral_info, *parameters):
+        return self._key(fiber, spectral_info.channel_number, spectral_info.frequency, spectral_info.baud_rate,
+                         spectral_info.roll_off, spectral_info.signal, parameters)
+
+    def _key(self, fiber, channel_number, frequency, baud_rate, roll_off, signal, parameters):
+        # the channel plan and the powers are keyed by the bytes of their arrays, without an object per channel
+        channel_plan = tuple(array(values, dtype=float).tobytes()
+                             for values in (channel_number, frequency, baud_rate, roll_off))
+        signal_power = rint(lin2db(array(signal, dtype=float)) / self.power_quantum_db)
+        return (type(fiber).__name__, _fingerprint(fiber.params), channel_plan, signal_power.shape,
+                signal_power.tobytes(), _fingerprint(parameters))
+
+    def carriers_nli(self, fiber, carriers, compute_nli, *parameters):
+        """ Returns the NLI generated in the fiber on each carrier, from the cache or computed by compute_nli
+        :param fiber: instance of elements.py/Fiber
+        :param carriers: the channels at the fiber input, after the input attenuation
+        :param compute_nli: function without arguments returning the NLI of each carrier [W]
+        :param parameters: other parameters of the NLI computation, part of the key
+        :return: read-only numpy array of the NLI of each carrier [W]
+        """
+        if self.max_size <= 0:
+            return compute_nli()
+        return self._nli(self.key(fiber, carriers, *parameters), compute_nli)
+
+    def spectral_nli(self, fiber, spectral_info, compute_nli, *parameters):
+        """ Same as carriers_nli for the channels of a spectral information, of one or several scenarios
+        :param spectral_info: instance of info.py/SpectralInformation at the fiber input, after the input attenuation
+        :return: read-only numpy array of the NLI of each channel [W], of the shape of the signal power
+        """
+        if self.max_size <= 0:
+            return compute_nli()
+        return self._nli(self.spectral_key(fiber, spectral_info, *parameters), compute_nli)
+
+    def _nli(self, key, compute_nli):
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        carriers_nli = array(compute_nli(), dtype=float)
+        carriers_nli.setflags(write=False)
+        self._entries[key] = carriers_nli
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return carriers_nli
+
+
+def _fingerprint(value):
+    """ Converts parameters, dictionaries, sequences and numpy arrays into hashable nested tuples """
+    if isinstance(value, Parameters):
+        value = value.asdict()
+    if isinstance(value, dict):
+        return tuple((key, _fingerprint(item)) for key, item in sorted(value.items()))
+    if isinstance(value, ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return tuple(_fingerprint(item) for item in value)
+    return value
+
+
+nli_cache = NliCache()
+
+
+@lru_cache(maxsize=None)
+def _solver_fingerprint():
+    return sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+def _unlink(file):
+    try:
+        file.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class RamanCache:
+    """ Content-addressed disk cache of the stimulated and spontaneous Raman scattering solutions, shared by all the
+    runs: e.g. the planning studies repeated on unchanged Raman spans skip the solver entirely.
+    Each solution is stored as a .npz file named after the hash of its kind, the fiber parameters and operational
+    data, the Raman pumps, the channel plan and signal powers at the fiber input and the Raman simulation parameters.
+    The hash also covers the source code of this module, so that a change of the solvers invalidates the solutions
+    stored by the previous versions.
+    When the files exceed max_size bytes, the least recently used ones are deleted.
+    The cache is disabled as long as directory is None.
+    """
+
+    format_version = 1
+
+    def __init__(self, directory=None, max_size=512 * 2**20):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, kind, fiber, carriers, raman_pumps, *parameters):
+        channel_plan = tuple((c.frequency, c.baud_rate, c.power.signal) for c in carriers)
+        pumps = tuple((p.power, p.frequency, p.propagation_direction) for p in raman_pumps or ())
+        content = (self.format_version, _solver_fingerprint(), kind, type(fiber).__name__, _fingerprint(fiber.params),
+                   _fingerprint(fiber.operational), channel_plan, pumps, _fingerprint(parameters))
+        return sha256(repr(content).encode()).hexdigest()
+
+    def solution(self, kind, fiber, carriers, raman_pumps, compute_solution, *parameters):
+        """ Returns a Raman scattering solution from the cache or computed by compute_solution
+        :param kind: the class of the solution, StimulatedRamanScattering or SpontaneousRamanScattering
+        :param fiber: instance of elements.py/RamanFiber
+        :param carriers: the channels at the fiber input
+        :param raman_pumps: the Raman pumps of the fiber
+        :param compute_solution: function without arguments returning the solution
+        :param parameters: other parameters of the solution, part of the key
+        :return: instance of kind
+        """
+        if self.directory is None:
+            return compute_solution()
+        directory = Path(self.directory)
+        filename = directory / f'{self.key(kind.__name__, fiber, carriers, raman_pumps, *parameters)}.npz'
+        try:
+            with load_arrays(filename) as arrays:
+                solution = kind(**{name: arrays[name] for name in arrays.files})
+            os.utime(filename)
+            self.hits += 1
+            return solution
+        except (OSError, ValueError, KeyError, TypeError, BadZipFile):
+            pass
+        self.misses += 1
+        solution = compute_solution()
+        directory.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(dir=directory, suffix='.tmp', delete=False) as file:
+            savez(file, **{name: value for name, value in vars(solution).items() if not name.startswith('_')})
+        os.replace(file.name, filename)
+        self._evict(directory)
+        return solution
+
+    def _evict(self, directory):
+        # the files may be deleted concurrently by the other runs sharing the directory
+        files = []
+        for file in directory.glob('*.npz'):
+            try:
+                files.append((file.stat(), file))
+            except FileNotFoundError:
+                pass
+        files.sort(key=lambda f: f[0].st_mtime)
+        size = sum([stat.st_size for stat, _ in files])
+        for stat, file in files:
+            if size <= self.max_size:
+                break
+            size -= stat.st_size
+            _unlink(file)
+
+    def clear(self):
+        if self.directory is not None:
+            for file in Path(self.directory).glob('*.npz'):
+                _unlink(file)
+        self.hits = 0
+        self.misses = 0
+
+
+raman_cache = RamanCache()
 
 
 class Simulation:
@@ -155,7 +640,33 @@ class Simulation:
 
     @classmethod
     def set_params(cls, sim_params):
+        cls.shutdown_nli_executor()
         cls._shared_dict['sim_params'] = sim_params
+        NliSolver._xpm_psi_cache.clear()
+
+    @classmethod
+    def nli_executor(cls):
+        """ Returns the pool of `sim_params.nli_params.workers` processes computing the NLI of the channels, created
+        at the first call and used by all the spans of the run, or None if the NLI is computed in this process.
+        The workers receive the simulation parameters once and read the data of a span from a file written once per
+        span, whose name is sent with the tasks. They do not share the caches of this process: each worker keeps its
+        own XPM psi cache, and the NLI cache is only looked up by this process before submitting the tasks of a span.
+        The pool is terminated by :meth:`shutdown_nli_executor`, also called by :meth:`set_params`.
+        """
+        workers = cls._shared_dict['sim_params'].nli_params.workers
+        if workers is None or workers <= 1:
+            return None
+        if 'nli_executor' not in cls._shared_dict:
+            cls._shared_dict['nli_executor'] = ProcessPoolExecutor(max_workers=workers, initializer=_init_nli_worker,
+                                                                   initargs=(cls._shared_dict['sim_params'],))
+        return cls._shared_dict['nli_executor']
+
+    @classmethod
+    def shutdown_nli_executor(cls):
+        """ Terminates the worker processes of the NLI executor, if any """
+        executor = cls._shared_dict.pop('nli_executor', None)
+        if executor is not None:
+            executor.shutdown()
 
     @classmethod
     def get_simulation(cls):
@@ -180,6 +691,120 @@ class StimulatedRamanScattering:
         self.z = z
         self.rho = rho
         self.power = power
+        self._profile = None
+
+    @property
+    def profile(self):
+        """ The SrsProfile of the solution, built at the first access and shared by all the NLI computations """
+        if self._profile is None:
+            self._profile = SrsProfile(self.frequency, self.z, self.rho)
+        return self._profile
+
+
+class SrsProfile:
+    """ Immutable field profiles rho(f, z) of an SRS solution, with a vectorized linear interpolation over the
+    frequency, linearly extrapolated outside of the solved frequencies.
+    The interpolation tables are sorted by frequency and precomputed, as are the profiles normalized by the fiber
+    attenuation, for each attenuation value requested.
+    """
+
+    def __init__(self, frequency, z, rho):
+        order = argsort(frequency)
+        self._frequency = _read_only(asarray(frequency, dtype=float)[order])
+        self._z = _read_only(asarray(z, dtype=float))
+        self._rho = _read_only(asarray(rho, dtype=float)[order])
+        if len(self._frequency) > 1:
+            self._slope = _read_only(diff(self._rho, axis=0) / diff(self._frequency)[:, newaxis])
+        else:
+            self._slope = None
+        self._normalization = {}
+
+    @property
+    def frequency(self):
+        return self._frequency
+
+    @property
+    def z(self):
+        return self._z
+
+    def rho(self, frequency):
+        """ Returns the field profiles at the given frequencies
+        :param frequency: frequency [Hz]. float or numpy array of shape S
+        :return: numpy array of shape S + (len(z),)
+        """
+        if self._slope is None:
+            return self._rho[0] * ones(asarray(frequency).shape + (1,))
+        index = clip(searchsorted(self._frequency, frequency) - 1, 0, len(self._frequency) - 2)
+        return self._rho[index] + (asarray(frequency) - self._frequency[index])[..., newaxis] * self._slope[index]
+
+    def rho_norm(self, frequency, alpha0):
+        """ Returns the field profiles at the given frequencies, normalized by the fiber attenuation alpha0
+        :param frequency: frequency [Hz]. float or numpy array of shape S
+        :param alpha0: power attenuation coefficient [Neper/m]
+        :return: numpy array of shape S + (len(z),)
+        """
+        if alpha0 not in self._normalization:
+            self._normalization[alpha0] = _read_only(exp(abs(alpha0) * self._z / 2))
+        return self.rho(frequency) * self._normalization[alpha0]
+
+
+def _read_only(array_value):
+    array_value.setflags(write=False)
+    return array_value
+
+
+class RamanCoefficients(namedtuple('RamanCoefficients', 'frequency_offset cr alpha')):
+    """ Read-only Raman coefficients of a fiber type on a frequency plan.
+
+        :param frequency_offset: absolute frequency offsets between the frequency slices (Hz). numpy ndarray
+        :param cr: Raman gain efficiency between the frequency slices (1/W/m), zero without Raman effect. numpy ndarray
+        :param alpha: power attenuation coefficient of the frequency slices (Neper/m). numpy array
+    """
+
+
+_raman_coefficients = OrderedDict()
+
+
+def raman_coefficients(fiber, frequencies, flag_raman=True, max_size=64):
+    """ Returns the Raman coefficients of the fiber on the frequency slices, shared by all the spans with the same
+    Raman efficiency and attenuation, i.e. of the same fiber type, and the same frequency plan. The coefficients are
+    computed once and never modified, neither are the fiber parameters.
+    :param fiber: instance of elements.py/RamanFiber
+    :param frequencies: frequency of the slices [Hz]. numpy array
+    :param flag_raman: if False the Raman gain efficiency is zero
+    :param max_size: maximum number of coefficients kept, the least recently used ones are discarded
+    :return: RamanCoefficients
+    """
+    params = fiber.params
+    key = (_fingerprint(params.raman_efficiency), _fingerprint(params.lin_loss_exp), _fingerprint(params.f_loss_ref),
+           tuple(frequencies), flag_raman)
+    if key in _raman_coefficients:
+        _raman_coefficients.move_to_end(key)
+        return _raman_coefficients[key]
+
+    frequency_offset = abs(subtract.outer(frequencies, frequencies))
+    if flag_raman:
+        raman_efficiency = params.raman_efficiency
+        cr = interp1d(raman_efficiency['frequency_offset'], raman_efficiency['cr'])(frequency_offset)
+    else:
+        cr = zeros(frequency_offset.shape)
+    coefficients = RamanCoefficients(_read_only(frequency_offset), _read_only(cr),
+                                     _read_only(array(fiber.alpha(frequencies), dtype=float)))
+    _raman_coefficients[key] = coefficients
+    while len(_raman_coefficients) > max_size:
+        _raman_coefficients.popitem(last=False)
+    return coefficients
+
+
+class RamanWarmStart(namedtuple('RamanWarmStart', 'frequency propagation_direction power_spectrum z power')):
+    """ Last converged stimulated Raman scattering BVP solution of a fiber.
+
+        :param frequency: frequency of the slices (Hz). numpy array
+        :param propagation_direction: +1 for the forward and -1 for the backward propagating slices. numpy array
+        :param power_spectrum: boundary power of the slices (W). numpy array
+        :param z: mesh of the space_resolution of the raman_parameters (m). numpy array
+        :param power: power of the slices along the mesh, interpolated from the solution (W). numpy ndarray
+    """
 
 
 class RamanSolver:
@@ -194,6 +819,7 @@ class RamanSolver:
         self._raman_pumps = None
         self._stimulated_raman_scattering = None
         self._spontaneous_raman_scattering = None
+        self._warm_start = None
 
     @property
     def fiber(self):
@@ -221,27 +847,34 @@ class RamanSolver:
     @property
     def stimulated_raman_scattering(self):
         if self._stimulated_raman_scattering is None:
-            self.calculate_stimulated_raman_scattering(self.carriers, self.raman_pumps)
+            def compute_solution():
+                self.calculate_stimulated_raman_scattering(self.carriers, self.raman_pumps)
+                return self._stimulated_raman_scattering
+            raman_params = Simulation.get_simulation().sim_params.raman_params
+            self._stimulated_raman_scattering = raman_cache.solution(
+                StimulatedRamanScattering, self.fiber, self.carriers, self.raman_pumps, compute_solution, raman_params)
         return self._stimulated_raman_scattering
 
     @property
     def spontaneous_raman_scattering(self):
         if self._spontaneous_raman_scattering is None:
-            self.calculate_spontaneous_raman_scattering(self.carriers, self.raman_pumps)
+            def compute_solution():
+                self.calculate_spontaneous_raman_scattering(self.carriers, self.raman_pumps)
+                return self._spontaneous_raman_scattering
+            raman_params = Simulation.get_simulation().sim_params.raman_params
+            self._spontaneous_raman_scattering = raman_cache.solution(
+                SpontaneousRamanScattering, self.fiber, self.carriers, self.raman_pumps, compute_solution,
+                raman_params)
         return self._spontaneous_raman_scattering
 
     def calculate_spontaneous_raman_scattering(self, carriers, raman_pumps):
-        raman_efficiency = self.fiber.params.raman_efficiency
         temperature = self.fiber.operational['temperature']
+        flag_raman = Simulation.get_simulation().sim_params.raman_params.flag_raman
 
         logger.debug('Start computing fiber Spontaneous Raman Scattering')
         power_spectrum, freq_array, prop_direct, bn_array = self._compute_power_spectrum(carriers, raman_pumps)
 
-        alphap_fiber = self.fiber.alpha(freq_array)
-
-        freq_diff = abs(freq_array - reshape(freq_array, (len(freq_array), 1)))
-        interp_cr = interp1d(raman_efficiency['frequency_offset'], raman_efficiency['cr'])
-        cr = interp_cr(freq_diff)
+        freq_diff, cr, alphap_fiber = raman_coefficients(self.fiber, freq_array, flag_raman)
 
         # z propagation axis
         z_array = self.stimulated_raman_scattering.z
@@ -256,6 +889,30 @@ class RamanSolver:
         logger.debug("Spontaneous Raman Scattering evaluated successfully")
         self._spontaneous_raman_scattering = spontaneous_raman_scattering
 
+    @staticmethod
+    def _spectral_bins(carriers, spectral_bin_width):
+        """ Groups the adjacent carriers into spectral bins, each one a carrier with the total power and baud rate of
+        its carriers, at their power-weighted mean frequency
+        :param carriers: a tuple of namedtuples describing the transmitted channels
+        :param spectral_bin_width: width of the spectral bins [Hz], starting from the lowest carrier frequency
+        :return: a list of namedtuples describing the spectral bins
+        """
+        carriers = sorted(carriers, key=attrgetter('frequency'))
+        bins = OrderedDict()
+        for carrier in carriers:
+            bin_index = int((carrier.frequency - carriers[0].frequency) // spectral_bin_width)
+            bins.setdefault(bin_index, []).append(carrier)
+
+        spectral_bins = []
+        for bin_carriers in bins.values():
+            frequency = array([carrier.frequency for carrier in bin_carriers])
+            power = array([carrier.power.signal for carrier in bin_carriers])
+            baud_rate = array([carrier.baud_rate for carrier in bin_carriers])
+            mean_frequency = (frequency * power).sum() / power.sum() if power.sum() > 0 else frequency.mean()
+            spectral_bins.append(bin_carriers[0]._replace(frequency=mean_frequency, baud_rate=baud_rate.sum(),
+                                                          power=bin_carriers[0].power._replace(signal=power.sum())))
+        return spectral_bins
+
     @staticmethod
     def _compute_power_spectrum(carriers, raman_pumps=None):
         """
@@ -287,13 +944,22 @@ class RamanSolver:
                 noise_bandwidth_array = append(noise_bandwidth_array, ref_bw)
 
         # Final sorting
-        ind = argsort(f_array)
+        ind = RamanSolver._slice_order(carriers, raman_pumps)
         f_array = f_array[ind]
         pow_array = pow_array[ind]
         propagation_direction = propagation_direction[ind]
 
         return pow_array, f_array, propagation_direction, noise_bandwidth_array
 
+    @staticmethod
+    def _slice_order(carriers, raman_pumps=None):
+        """ Returns the permutation sorting by frequency the slices of _compute_power_spectrum, built with the
+        carriers sorted by frequency followed by the Raman pumps: the slices at positions lower than len(carriers) in
+        the permutation are the carriers.
+        """
+        return argsort([carrier.frequency for carrier in sorted(carriers, key=attrgetter('frequency'))] +
+                       [pump.frequency for pump in raman_pumps or ()], kind='stable')
+
     def _int_spontaneous_raman(self, z_array, raman_matrix, alphap_fiber, freq_array,
                                cr_raman_matrix, freq_diff, ase_bc, bn_array, temperature):
         spontaneous_raman_scattering = OptimizeResult()
@@ -305,29 +971,24 @@ class RamanSolver:
         h = ph.value('Planck constant')
         kb = ph.value('Boltzmann constant')
 
-        power_ase = nan * ones(raman_matrix.shape)
         int_pump = cumtrapz(raman_matrix, z_array, dx=dx, axis=1, initial=0)
 
-        for f_ind, f_ase in enumerate(freq_array):
-            cr_raman = cr_raman_matrix[f_ind, :]
-            vibrational_loss = f_ase / freq_array[:f_ind]
-            eta = 1 / (exp((h * freq_diff[f_ind, f_ind + 1:]) / (kb * temperature)) - 1)
-
-            int_fiber_loss = -alphap_fiber[f_ind] * z_array
-            int_raman_loss = sum((cr_raman[:f_ind] * vibrational_loss * int_pump[:f_ind, :].transpose()).transpose(),
-                                    axis=0)
-            int_raman_gain = sum((cr_raman[f_ind + 1:] * int_pump[f_ind + 1:, :].transpose()).transpose(), axis=0)
-
-            int_gain_loss = int_fiber_loss + int_raman_gain + int_raman_loss
+        # phonon occupation of the slices pumping each slice at a lower frequency
+        pumping = triu_indices(len(freq_array), 1)
+        eta = zeros(freq_diff.shape)
+        eta[pumping] = 1 / (exp((h * freq_diff[pumping]) / (kb * temperature)) - 1)
 
-            new_ase = sum((cr_raman[f_ind + 1:] * (1 + eta) * raman_matrix[f_ind + 1:, :].transpose()).transpose()
-                             * h * f_ase * bn_array[f_ind], axis=0)
+        vibrational_loss = outer(freq_array, 1 / freq_array)
+        raman_gain_loss = triu(cr_raman_matrix, 1) + tril(vibrational_loss * cr_raman_matrix, -1)
+        int_gain_loss = -outer(alphap_fiber, z_array) + raman_gain_loss @ int_pump
 
-            bc_evolution = ase_bc[f_ind] * exp(int_gain_loss)
-            ase_evolution = exp(int_gain_loss) * cumtrapz(new_ase * exp(-int_gain_loss), z_array, dx=dx, initial=0)
+        new_ase = (triu(cr_raman_matrix * (1 + eta), 1) @ raman_matrix) * reshape(h * freq_array * bn_array, (-1, 1))
 
-            power_ase[f_ind, :] = bc_evolution + ase_evolution
+        bc_evolution = reshape(ase_bc, (-1, 1)) * exp(int_gain_loss)
+        ase_evolution = exp(int_gain_loss) * cumtrapz(new_ase * exp(-int_gain_loss), z_array, dx=dx, axis=1,
+                                                      initial=0)
 
+        power_ase = bc_evolution + ase_evolution
         spontaneous_raman_scattering.x = 2 * power_ase
         return spontaneous_raman_scattering
 
@@ -338,12 +999,9 @@ class RamanSolver:
         """
         # fiber parameters
         fiber_length = self.fiber.params.length
-        raman_efficiency = self.fiber.params.raman_efficiency
         simulation = Simulation.get_simulation()
         sim_params = simulation.sim_params
 
-        if not sim_params.raman_params.flag_raman:
-            raman_efficiency['cr'] = zeros(len(raman_efficiency['cr']))
         # raman solver parameters
         z_resolution = sim_params.raman_params.space_resolution
         tolerance = sim_params.raman_params.tolerance
@@ -351,32 +1009,150 @@ class RamanSolver:
         logger.debug('Start computing fiber Stimulated Raman Scattering')
 
         power_spectrum, freq_array, prop_direct, _ = self._compute_power_spectrum(carriers, raman_pumps)
+        carrier_power_spectrum, carrier_freq_array = power_spectrum, freq_array
+        spectral_bin_width = sim_params.raman_params.spectral_bin_width
+        spectral_bins = self._spectral_bins(carriers, spectral_bin_width) if spectral_bin_width else carriers
+        if 1 < len(spectral_bins) < len(carriers):
+            # solve the SRS on bins of adjacent carriers, whose profiles are then interpolated on each carrier
+            power_spectrum, freq_array, prop_direct, _ = self._compute_power_spectrum(spectral_bins, raman_pumps)
+            logger.debug(f'Stimulated Raman Scattering solved on {len(freq_array)} spectral slices out of '
+                         f'{len(carrier_freq_array)}')
 
-        alphap_fiber = self.fiber.alpha(freq_array)
-
-        freq_diff = abs(freq_array - reshape(freq_array, (len(freq_array), 1)))
-        interp_cr = interp1d(raman_efficiency['frequency_offset'], raman_efficiency['cr'])
-        cr = interp_cr(freq_diff)
+        _, cr, alphap_fiber = raman_coefficients(self.fiber, freq_array, sim_params.raman_params.flag_raman)
 
         # z propagation axis
         z = append(arange(0, fiber_length, z_resolution), fiber_length)
 
+        raman_matrix = self._raman_gain_loss_matrix(freq_array, cr)
+
         def ode_function(z, p):
-            return self._ode_stimulated_raman(z, p, alphap_fiber, freq_array, cr, prop_direct)
+            return self._ode_stimulated_raman(z, p, alphap_fiber, raman_matrix, prop_direct)
+
+        mesh_tolerance = sim_params.raman_params.adaptive_mesh_tolerance
+        ivp_solution = None
+        if all(prop_direct == +1):
+            # without counter-propagating pumps all the powers are known at z = 0: solve an initial value problem
+            ivp_solution = solve_ivp(ode_function, (0, fiber_length), power_spectrum,
+                                     t_eval=None if mesh_tolerance else z, dense_output=bool(mesh_tolerance),
+                                     vectorized=True, rtol=tolerance, atol=tolerance * power_spectrum.min())
+            logger.debug(f'Stimulated Raman Scattering integrated with {ivp_solution.nfev} evaluations: '
+                         f'{ivp_solution.message}')
+            if not ivp_solution.success:
+                logger.warning(f'Stimulated Raman Scattering integration failed: {ivp_solution.message} '
+                               f'Solving it as a boundary value problem.')
+        if ivp_solution is not None and ivp_solution.success:
+            z, power, solution = ivp_solution.t, ivp_solution.y, ivp_solution.sol
+        else:
+            if mesh_tolerance:
+                # the solver starts from a coarse mesh
+                z = linspace(0, fiber_length, 5)
+            z, power, solution = self._solve_stimulated_raman_bvp(z, power_spectrum, freq_array, alphap_fiber,
+                                                                  raman_matrix, prop_direct, tolerance)
+            if mesh_tolerance:
+                # the collocation residuals of the solver do not bound the relative error of the weak slices: the
+                # solution is refined on its own adaptive mesh
+                z = self._adaptive_mesh(solution, power_spectrum, alphap_fiber, fiber_length, mesh_tolerance)
+                z, power, solution = self._solve_stimulated_raman_bvp(z, power_spectrum, freq_array, alphap_fiber,
+                                                                      raman_matrix, prop_direct, tolerance,
+                                                                      initial_guess=solution(z))
+        if mesh_tolerance:
+            z = self._adaptive_mesh(solution, power_spectrum, alphap_fiber, fiber_length, mesh_tolerance)
+            power = solution(z)
+            logger.debug(f'Stimulated Raman Scattering sampled on {len(z)} points')
+
+        rho = (power.transpose() / power_spectrum).transpose()
+        rho = sqrt(rho)    # From power attenuation to field attenuation
+        if len(freq_array) < len(carrier_freq_array):
+            # the pumps keep their own profile
+            is_bin = self._slice_order(spectral_bins, raman_pumps) < len(spectral_bins)
+            is_carrier = self._slice_order(carriers, raman_pumps) < len(carriers)
+            carrier_rho = empty((len(carrier_freq_array), len(z)))
+            carrier_rho[is_carrier] = interp1d(freq_array[is_bin], rho[is_bin], axis=0, assume_sorted=True,
+                                               fill_value='extrapolate')(carrier_freq_array[is_carrier])
+            carrier_rho[~is_carrier] = rho[~is_bin]
+            rho, freq_array = carrier_rho, carrier_freq_array
+            power = rho ** 2 * reshape(carrier_power_spectrum, (-1, 1))
+        stimulated_raman_scattering = StimulatedRamanScattering(freq_array, z, rho, power)
+
+        self._stimulated_raman_scattering = stimulated_raman_scattering
+
+    def _solve_stimulated_raman_bvp(self, z, power_spectrum, freq_array, alphap_fiber, raman_matrix, prop_direct,
+                                    tolerance, initial_guess=None):
+        """ Solves the Raman ODEs as a boundary value problem, the power of the counter-propagating slices being
+        known at the fiber end. When the warm_start_tolerance of the raman_parameters is set, the last converged
+        solution of the fiber, sampled on the mesh z and scaled to the new boundary powers, is the initial guess of
+        the solver if the powers of the same frequency slices deviate by less than this tolerance [dB].
+        :return: the mesh of the solution [m], the power of each frequency slice along it [W], the callable
+        continuous solution
+        """
+        def ode_function(z, p):
+            return self._ode_stimulated_raman(z, p, alphap_fiber, raman_matrix, prop_direct)
+
+        def ode_jacobian(z, p):
+            return self._jacobian_stimulated_raman(z, p, alphap_fiber, raman_matrix, prop_direct)
 
         def boundary_residual(ya, yb):
             return self._residuals_stimulated_raman(ya, yb, power_spectrum, prop_direct)
 
-        initial_guess_conditions = self._initial_guess_stimulated_raman(z, power_spectrum, alphap_fiber, prop_direct)
+        residuals_jacobian = self._residuals_jacobian_stimulated_raman(prop_direct)
+
+        def boundary_jacobian(ya, yb):
+            return residuals_jacobian
+
+        warm_start_tolerance = Simulation.get_simulation().sim_params.raman_params.warm_start_tolerance
+        if initial_guess is not None:
+            initial_guess_conditions = initial_guess
+        elif warm_start_tolerance is not None and self._warm_start is not None and \
+                self._warm_start.z.shape == z.shape and (self._warm_start.z == z).all() and \
+                self._warm_start.frequency.shape == freq_array.shape and \
+                (self._warm_start.frequency == freq_array).all() and \
+                (self._warm_start.propagation_direction == prop_direct).all() and \
+                abs(lin2db(power_spectrum / self._warm_start.power_spectrum)).max() <= warm_start_tolerance:
+            scaling = power_spectrum / self._warm_start.power_spectrum
+            initial_guess_conditions = self._warm_start.power * scaling[:, newaxis]
+        else:
+            initial_guess_conditions = self._initial_guess_stimulated_raman(z, power_spectrum, alphap_fiber,
+                                                                            prop_direct)
 
         # ODE SOLVER
-        bvp_solution = solve_bvp(ode_function, boundary_residual, z, initial_guess_conditions, tol=tolerance)
+        bvp_solution = solve_bvp(ode_function, boundary_residual, z, initial_guess_conditions, tol=tolerance,
+                                 fun_jac=ode_jacobian, bc_jac=boundary_jacobian)
+        logger.debug(f'Stimulated Raman Scattering solved in {bvp_solution.niter} iterations: {bvp_solution.message}')
+        if bvp_solution.success and initial_guess is None:
+            # the solution is stored on the initial mesh, not on the mesh refined by the solver which would keep
+            # growing along the warm-started solutions
+            self._warm_start = RamanWarmStart(freq_array, prop_direct, power_spectrum, z, bvp_solution.sol(z))
+        return bvp_solution.x, bvp_solution.y, bvp_solution.sol
 
-        rho = (bvp_solution.y.transpose() / power_spectrum).transpose()
-        rho = sqrt(rho)    # From power attenuation to field attenuation
-        stimulated_raman_scattering = StimulatedRamanScattering(freq_array, bvp_solution.x, rho, bvp_solution.y)
-
-        self._stimulated_raman_scattering = stimulated_raman_scattering
+    @staticmethod
+    def _adaptive_mesh(solution, power_spectrum, alphap_fiber, fiber_length, tolerance, max_refinements=16):
+        """ Samples the SRS solution on a mesh refined by bisection wherever the linear interpolation of the power
+        profiles normalized by the fiber loss, rho_norm**2, deviates from them by more than the relative tolerance
+        :param solution: callable returning the power of the frequency slices at an array of z [W]
+        :param power_spectrum: boundary power of the frequency slices [W]. numpy array
+        :param alphap_fiber: frequency dependent fiber attenuation of signal power [1/m]. numpy array
+        :param fiber_length: fiber length [m]
+        :param tolerance: relative tolerance of the linear interpolation
+        :param max_refinements: maximum number of bisections of the initial intervals
+        :return: z: the mesh [m]. numpy array
+        """
+        def normalized_profile(z):
+            return solution(z) / reshape(power_spectrum, (-1, 1)) * exp(outer(alphap_fiber, z))
+
+        z = linspace(0, fiber_length, 5)
+        refined = ones(len(z) - 1, dtype=bool)
+        for _ in range(max_refinements):
+            scale = abs(normalized_profile(z)).max(axis=1, keepdims=True)
+            left, right = z[:-1][refined], z[1:][refined]
+            middle = (left + right) / 2
+            middle_profile = normalized_profile(middle)
+            interpolated = (normalized_profile(left) + normalized_profile(right)) / 2
+            split = (abs(middle_profile - interpolated) > tolerance * scale).any(axis=0)
+            if not split.any():
+                break
+            z = unique(concatenate((z, middle[split])))
+            refined = isin(z[:-1], concatenate((left[split], middle[split])))
+        return z
 
     def _residuals_stimulated_raman(self, ya, yb, power_spectrum, prop_direct):
 
@@ -390,6 +1166,15 @@ class RamanSolver:
 
         return power_spectrum - computed_boundary_value
 
+    @staticmethod
+    def _residuals_jacobian_stimulated_raman(prop_direct):
+        """ Computes the Jacobian of the boundary residuals, which only select the input power of each slice
+        :param prop_direct: indicates the propagation direction of each power slice in power_spectrum:
+        +1 for forward propagation and -1 for backward propagation. Frequency defined by freq_array. numpy array
+        :return: the derivatives of the residuals with respect to ya and yb. numpy ndarrays. Size nxn
+        """
+        return -diag(prop_direct == +1).astype(float), -diag(prop_direct != +1).astype(float)
+
     def _initial_guess_stimulated_raman(self, z, power_spectrum, alphap_fiber, prop_direct):
         """ Computes the initial guess knowing the boundary conditions
         :param z: patial axis [m]. numpy array
@@ -413,36 +1198,55 @@ class RamanSolver:
 
         return power_guess
 
-    def _ode_stimulated_raman(self, z, power_spectrum, alphap_fiber, freq_array, cr_raman_matrix, prop_direct):
+    @staticmethod
+    def _raman_gain_loss_matrix(freq_array, cr_raman_matrix):
+        """ Masked Raman coupling matrix of the ODEs: the upper triangle gives the gain from the higher frequency
+        slices, the lower triangle the loss towards the lower frequency slices, including the vibrational loss.
+        :param freq_array: reference frequency axis [Hz], sorted in ascending order. numpy array. Size n
+        :param cr_raman_matrix: Cr(f) Raman gain efficiency between the frequency slices [1/W/m]. Size nxn
+        :return: the Raman coupling matrix [1/W/m]. numpy ndarray. Size nxn
+        """
+        vibrational_loss = outer(freq_array, 1 / freq_array)
+        return triu(cr_raman_matrix, 1) - tril(vibrational_loss * cr_raman_matrix, -1)
+
+    def _ode_stimulated_raman(self, z, power_spectrum, alphap_fiber, raman_matrix, prop_direct):
         """ Aim of ode_raman is to implement the set of ordinary differential equations (ODEs)
         describing the Raman effect.
         :param z: spatial axis (unused).
         :param power_spectrum: power in each frequency slice [W].
-        Frequency axis is defined by freq_array. numpy array. Size n
+        Frequency axis is defined by freq_array. numpy ndarray. Size nxm
         :param alphap_fiber: frequency dependent fiber attenuation of signal power [1/m].
         Frequency defined by freq_array. numpy array. Size n
-        :param freq_array: reference frequency axis [Hz]. numpy array. Size n
-        :param cr_raman: Cr(f) Raman gain efficiency variation in frequency [1/W/m].
+        :param raman_matrix: Raman coupling matrix as returned by _raman_gain_loss_matrix [1/W/m].
         Frequency defined by freq_array. numpy ndarray. Size nxn
         :param prop_direct: indicates the propagation direction of each power slice in power_spectrum:
         +1 for forward propagation and -1 for backward propagation.
         Frequency defined by freq_array. numpy array. Size n
-        :return: dP/dz: the power variation in dz [W/m]. numpy array. Size n
+        :return: dP/dz: the power variation in dz [W/m]. numpy ndarray. Size nxm
         """
+        gain_loss = raman_matrix @ power_spectrum - reshape(alphap_fiber, (-1, 1))
+        return reshape(prop_direct, (-1, 1)) * gain_loss * power_spectrum
 
-        dpdz = nan * ones(power_spectrum.shape)
-        for f_ind, power in enumerate(power_spectrum):
-            cr_raman = cr_raman_matrix[f_ind, :]
-            vibrational_loss = freq_array[f_ind] / freq_array[:f_ind]
-
-            for z_ind, power_sample in enumerate(power):
-                raman_gain = sum(cr_raman[f_ind + 1:] * power_spectrum[f_ind + 1:, z_ind])
-                raman_loss = sum(vibrational_loss * cr_raman[:f_ind] * power_spectrum[:f_ind, z_ind])
-
-                dpdz_element = prop_direct[f_ind] * (-alphap_fiber[f_ind] + raman_gain - raman_loss) * power_sample
-                dpdz[f_ind][z_ind] = dpdz_element
-
-        return vstack(dpdz)
+    def _jacobian_stimulated_raman(self, z, power_spectrum, alphap_fiber, raman_matrix, prop_direct):
+        """ Computes the Jacobian of the Raman ODEs implemented by _ode_stimulated_raman.
+        :param z: spatial axis (unused).
+        :param power_spectrum: power in each frequency slice [W].
+        Frequency axis is defined by freq_array. numpy ndarray. Size nxm
+        :param alphap_fiber: frequency dependent fiber attenuation of signal power [1/m].
+        Frequency defined by freq_array. numpy array. Size n
+        :param raman_matrix: Raman coupling matrix as returned by _raman_gain_loss_matrix [1/W/m].
+        Frequency defined by freq_array. numpy ndarray. Size nxn
+        :param prop_direct: indicates the propagation direction of each power slice in power_spectrum:
+        +1 for forward propagation and -1 for backward propagation.
+        Frequency defined by freq_array. numpy array. Size n
+        :return: d(dP_i/dz)/dP_j: the derivative of the power variation of slice i with respect to the power of
+        slice j at each z [1/m]. numpy ndarray. Size nxnxm
+        """
+        gain_loss = raman_matrix @ power_spectrum - reshape(alphap_fiber, (-1, 1))
+        jacobian = (reshape(prop_direct, (-1, 1)) * raman_matrix)[:, :, newaxis] * power_spectrum[:, newaxis, :]
+        diagonal = arange(len(prop_direct))
+        jacobian[diagonal, diagonal, :] += reshape(prop_direct, (-1, 1)) * gain_loss
+        return jacobian
 
 
 class NliSolver:
@@ -451,14 +1255,24 @@ class NliSolver:
         List of implemented methods:
         'gn_model_analytic': eq. 120 from arXiv:1209.0394
         'ggn_spectrally_separated_xpm_spm': XPM plus SPM
+        'srs_closed_form': closed-form approximation of the GGN model on the SRS power profiles, computed on all the
+        channels of a span at once
+        A solver holds the SRS solution of the current span, the count of integrand evaluations and the shared XPM psi
+        cache: it is not safe to call concurrently, the NLI of a span is parallelized over worker processes instead.
     """
 
+    # XPM psi values shared by all the fibers, see _xpm_psi; the least recently used ones beyond
+    # _xpm_psi_cache_size are discarded and all of them are cleared by Simulation.set_params
+    _xpm_psi_cache = OrderedDict()
+    _xpm_psi_cache_size = 4096
+
     def __init__(self, fiber=None):
         """ Initialize the Nli solver object.
         :param fiber: instance of elements.py/Fiber.
         """
         self._fiber = fiber
         self._stimulated_raman_scattering = None
+        self.integrand_evaluations = 0
 
     @property
     def fiber(self):
@@ -472,66 +1286,70 @@ class NliSolver:
     def stimulated_raman_scattering(self, stimulated_raman_scattering):
         self._stimulated_raman_scattering = stimulated_raman_scattering
 
-    def compute_nli(self, carrier, *carriers):
+    def compute_nli(self, carrier, *carriers, f_resolution=None):
         """ Compute NLI power generated by the WDM comb `*carriers` on the channel under test `carrier`
         at the end of the fiber span.
+        The FrequencyResolution f_resolution of the GGN integrals is planned for the comb if not given.
         """
         simulation = Simulation.get_simulation()
         sim_params = simulation.sim_params
         if 'gn_model_analytic' == sim_params.nli_params.nli_method_name.lower():
             carrier_nli = self._gn_analytic(carrier, *carriers)
+        elif 'srs_closed_form' == sim_params.nli_params.nli_method_name.lower():
+            carrier_nli = srs_closed_form_nli((carrier,), carriers, self.fiber, self.stimulated_raman_scattering)[0]
         elif 'ggn_spectrally_separated' in sim_params.nli_params.nli_method_name.lower():
-            eta_matrix = self._compute_eta_matrix(carrier, *carriers)
-            carrier_nli = self._carrier_nli_from_eta_matrix(eta_matrix, carrier, *carriers)
+            if f_resolution is None:
+                channel_numbers = [c.channel_number for c in carriers]
+                f_resolution = frequency_resolution(self.fiber, sim_params,
+                                                    max(channel_numbers) - min(channel_numbers))
+            eta_vector = self._compute_eta_vector(carrier, *carriers, f_resolution=f_resolution)
+            carrier_nli = self._carrier_nli_from_eta_vector(eta_vector, carrier, *carriers)
         else:
             raise ValueError(f'Method {sim_params.nli_params.nli_method_name} not implemented.')
 
         return carrier_nli
 
     @staticmethod
-    def _carrier_nli_from_eta_matrix(eta_matrix, carrier, *carriers):
-        carrier_nli = 0
-        for pump_carrier_1 in carriers:
-            for pump_carrier_2 in carriers:
-                carrier_nli += eta_matrix[pump_carrier_1.channel_number - 1, pump_carrier_2.channel_number - 1] * \
-                    pump_carrier_1.power.signal * pump_carrier_2.power.signal
-        carrier_nli *= carrier.power.signal
-
+    def _carrier_nli_from_eta_vector(eta_vector, carrier, *carriers):
+        """ Contracts the eta vector with the power of the carriers. Being the NLI computed as a sum of SPM and XPM
+        contributions, only the diagonal terms of the eta matrix, i.e. eta_vector, are non-zero.
+        """
+        pump_power = array([pump_carrier.power.signal for pump_carrier in carriers])
+        carrier_nli = carrier.power.signal * (eta_vector @ pump_power**2)
         return carrier_nli
 
-    def _compute_eta_matrix(self, cut_carrier, *carriers):
-        cut_index = cut_carrier.channel_number - 1
+    def _compute_eta_vector(self, cut_carrier, *carriers, f_resolution=None):
+        """ Computes the NLI efficiency of each carrier of the comb on cut_carrier: SPM for cut_carrier itself and XPM
+        for the others.
+        :return: eta_vector: numpy array aligned with carriers [1/W^2]
+        """
         simulation = Simulation.get_simulation()
         sim_params = simulation.sim_params
-        # Matrix initialization
-        matrix_size = max(carriers, key=lambda x: getattr(x, 'channel_number')).channel_number
-        eta_matrix = zeros(shape=(matrix_size, matrix_size))
-
-        # SPM
-        logger.debug(f'Start computing SPM on channel #{cut_carrier.channel_number}')
-        # SPM GGN
-        if 'ggn' in sim_params.nli_params.nli_method_name.lower():
-            partial_nli = self._generalized_spectrally_separated_spm(cut_carrier)
-        # SPM GN
-        elif 'gn' in sim_params.nli_params.nli_method_name.lower():
-            partial_nli = self._gn_analytic(cut_carrier, *[cut_carrier])
-        eta_matrix[cut_index, cut_index] = partial_nli / (cut_carrier.power.signal**3)
-
-        # XPM
-        for pump_carrier in carriers:
-            pump_index = pump_carrier.channel_number - 1
-            if not (cut_index == pump_index):
+        eta_vector = zeros(len(carriers))
+
+        for pump_index, pump_carrier in enumerate(carriers):
+            if pump_carrier.channel_number == cut_carrier.channel_number:
+                # SPM
+                logger.debug(f'Start computing SPM on channel #{cut_carrier.channel_number}')
+                # SPM GGN
+                if 'ggn' in sim_params.nli_params.nli_method_name.lower():
+                    partial_nli = self._generalized_spectrally_separated_spm(cut_carrier, f_resolution)
+                # SPM GN
+                elif 'gn' in sim_params.nli_params.nli_method_name.lower():
+                    partial_nli = self._gn_analytic(cut_carrier, *[cut_carrier])
+                eta_vector[pump_index] = partial_nli / (cut_carrier.power.signal**3)
+            else:
+                # XPM
                 logger.debug(f'Start computing XPM on channel #{cut_carrier.channel_number} '
                              f'from channel #{pump_carrier.channel_number}')
                 # XPM GGN
                 if 'ggn' in sim_params.nli_params.nli_method_name.lower():
-                    partial_nli = self._generalized_spectrally_separated_xpm(cut_carrier, pump_carrier)
-                # XPM GGN
+                    partial_nli = self._generalized_spectrally_separated_xpm(cut_carrier, pump_carrier, f_resolution)
+                # XPM GN
                 elif 'gn' in sim_params.nli_params.nli_method_name.lower():
                     partial_nli = self._gn_analytic(cut_carrier, *[pump_carrier])
-                eta_matrix[pump_index, pump_index] = \
-                    partial_nli / (cut_carrier.power.signal * pump_carrier.power.signal**2)
-        return eta_matrix
+                eta_vector[pump_index] = partial_nli / (cut_carrier.power.signal * pump_carrier.power.signal**2)
+        return eta_vector
 
     # Methods for computing GN-model
     def _gn_analytic(self, carrier, *carriers):
@@ -541,28 +1359,12 @@ class NliSolver:
         :param carriers: the full WDM comb
         :return: carrier_nli: the amount of nonlinear interference in W on the carrier under analysis
         """
-        beta2 = self.fiber.params.beta2
-        gamma = self.fiber.params.gamma
-        effective_length = self.fiber.params.effective_length
-        asymptotic_length = self.fiber.params.asymptotic_length
-
-        g_nli = 0
-        for interfering_carrier in carriers:
-            g_interfering = interfering_carrier.power.signal / interfering_carrier.baud_rate
-            g_signal = carrier.power.signal / carrier.baud_rate
-            g_nli += g_interfering**2 * g_signal \
-                * _psi(carrier, interfering_carrier, beta2=beta2, asymptotic_length=asymptotic_length)
-        g_nli *= (16.0 / 27.0) * (gamma * effective_length) ** 2 /\
-                 (2 * pi * abs(beta2) * asymptotic_length)
-        carrier_nli = carrier.baud_rate * g_nli
-        return carrier_nli
+        return gn_analytic_nli((carrier,), carriers, self.fiber.params)[0]
 
     # Methods for computing the GGN-model
-    def _generalized_spectrally_separated_spm(self, carrier):
+    def _generalized_spectrally_separated_spm(self, carrier, f_resolution):
         gamma = self.fiber.params.gamma
-        simulation = Simulation.get_simulation()
-        sim_params = simulation.sim_params
-        f_cut_resolution = sim_params.nli_params.f_cut_resolution['delta_0']
+        f_cut_resolution = f_resolution.f_cut_resolution[0]
         f_eval = carrier.frequency
         g_cut = (carrier.power.signal / carrier.baud_rate)
 
@@ -570,24 +1372,66 @@ class NliSolver:
             self._generalized_psi(carrier, carrier, f_eval, f_cut_resolution, f_cut_resolution)
         return spm_nli
 
-    def _generalized_spectrally_separated_xpm(self, cut_carrier, pump_carrier):
+    def _generalized_spectrally_separated_xpm(self, cut_carrier, pump_carrier, f_resolution):
         gamma = self.fiber.params.gamma
-        simulation = Simulation.get_simulation()
-        sim_params = simulation.sim_params
-        delta_index = pump_carrier.channel_number - cut_carrier.channel_number
-        f_cut_resolution = sim_params.nli_params.f_cut_resolution[f'delta_{delta_index}']
-        f_pump_resolution = sim_params.nli_params.f_pump_resolution
-        f_eval = cut_carrier.frequency
+        delta_count = abs(pump_carrier.channel_number - cut_carrier.channel_number)
+        f_cut_resolution = f_resolution.f_cut_resolution[delta_count]
+        f_pump_resolution = f_resolution.f_pump_resolution
         g_pump = (pump_carrier.power.signal / pump_carrier.baud_rate)
         g_cut = (cut_carrier.power.signal / cut_carrier.baud_rate)
+        xpm_nli = cut_carrier.baud_rate * (16.0 / 27.0) * gamma ** 2 * g_pump**2 * g_cut * \
+            2 * self._xpm_psi(cut_carrier, pump_carrier, f_cut_resolution, f_pump_resolution)
+        return xpm_nli
+
+    def _xpm_psi(self, cut_carrier, pump_carrier, f_cut_resolution, f_pump_resolution):
+        """ It computes the generalized psi function of the XPM contribution of pump_carrier on cut_carrier.
+        If `sim_params.nli_params.xpm_cache_tolerance` is set, the values are shared among all the (CUT, pump) pairs,
+        also of different spans, having the same fiber, frequency offset, symbol rates and roll-offs, and the same
+        local dispersion, attenuation and normalized SRS profile within the tolerance.
+        :return: generalized_psi
+        """
+        simulation = Simulation.get_simulation()
+        tolerance = simulation.sim_params.nli_params.xpm_cache_tolerance
+        if tolerance is not None:
+            key = self._xpm_psi_key(cut_carrier, pump_carrier, f_cut_resolution, f_pump_resolution, tolerance)
+            if key in self._xpm_psi_cache:
+                self._xpm_psi_cache.move_to_end(key)
+                return self._xpm_psi_cache[key]
+
+        f_eval = cut_carrier.frequency
         frequency_offset_threshold = self._frequency_offset_threshold(pump_carrier.baud_rate)
         if abs(cut_carrier.frequency - pump_carrier.frequency) <= frequency_offset_threshold:
-            xpm_nli = cut_carrier.baud_rate * (16.0 / 27.0) * gamma ** 2 * g_pump**2 * g_cut * \
-                2 * self._generalized_psi(cut_carrier, pump_carrier, f_eval, f_cut_resolution, f_pump_resolution)
+            generalized_psi = self._generalized_psi(cut_carrier, pump_carrier, f_eval, f_cut_resolution,
+                                                    f_pump_resolution)
         else:
-            xpm_nli = cut_carrier.baud_rate * (16.0 / 27.0) * gamma ** 2 * g_pump**2 * g_cut * \
-                2 * self._fast_generalized_psi(cut_carrier, pump_carrier, f_eval, f_cut_resolution)
-        return xpm_nli
+            generalized_psi = self._fast_generalized_psi(cut_carrier, pump_carrier, f_eval, f_cut_resolution)
+
+        if tolerance is not None:
+            self._xpm_psi_cache[key] = generalized_psi
+            while len(self._xpm_psi_cache) > self._xpm_psi_cache_size:
+                self._xpm_psi_cache.popitem(last=False)
+        return generalized_psi
+
+    def _xpm_psi_key(self, cut_carrier, pump_carrier, f_cut_resolution, f_pump_resolution, tolerance):
+        """ Returns the key of the XPM psi cache: the exact fiber and integration parameters, plus the quantities
+        depending on the absolute position in the spectrum quantized with the relative tolerance.
+        """
+        alpha0 = self.fiber.alpha0(cut_carrier.frequency)
+        beta2 = self.fiber.params.beta2
+        beta3 = self.fiber.params.beta3
+        f_ref_beta = self.fiber.params.ref_frequency
+        z = self.stimulated_raman_scattering.z
+        rho_norm_pump = self.stimulated_raman_scattering.profile.rho_norm(pump_carrier.frequency, alpha0)
+        frequency_offset = pump_carrier.frequency - cut_carrier.frequency
+        local_beta2 = beta2 + 2 * pi * beta3 * ((cut_carrier.frequency + pump_carrier.frequency) / 2 - f_ref_beta)
+        nli_params = Simulation.get_simulation().sim_params.nli_params
+        return (beta2, beta3, f_ref_beta, tuple(z), f_cut_resolution, f_pump_resolution,
+                self._integration_method(), nli_params.integration_tolerance,
+                cut_carrier.baud_rate, cut_carrier.roll_off, pump_carrier.baud_rate, pump_carrier.roll_off,
+                int(rint(frequency_offset / (tolerance * pump_carrier.baud_rate))),
+                int(rint(local_beta2 / (tolerance * abs(beta2)))),
+                int(rint(alpha0 / (tolerance * self.fiber.alpha0()))),
+                tuple(rint(rho_norm_pump / tolerance).astype(int)))
 
     def _fast_generalized_psi(self, cut_carrier, pump_carrier, f_eval, f_cut_resolution):
         """ It computes the generalized psi function similarly to the one used in the GN model
@@ -599,31 +1443,36 @@ class NliSolver:
         beta3 = self.fiber.params.beta3
         f_ref_beta = self.fiber.params.ref_frequency
         z = self.stimulated_raman_scattering.z
-        frequency_rho = self.stimulated_raman_scattering.frequency
-        rho_norm = self.stimulated_raman_scattering.rho * exp(abs(alpha0) * z / 2)
-        if len(frequency_rho) == 1:
-            def rho_function(f): return rho_norm[0, :]
-        else:
-            rho_function = interp1d(frequency_rho, rho_norm, axis=0, fill_value='extrapolate')
-        rho_norm_pump = rho_function(pump_carrier.frequency)
+        rho_norm_pump = self.stimulated_raman_scattering.profile.rho_norm(pump_carrier.frequency, alpha0)
 
         f1_array = array([pump_carrier.frequency - (pump_carrier.baud_rate * (1 + pump_carrier.roll_off) / 2),
                          pump_carrier.frequency + (pump_carrier.baud_rate * (1 + pump_carrier.roll_off) / 2)])
-        f2_array = arange(cut_carrier.frequency,
-                          cut_carrier.frequency + (cut_carrier.baud_rate * (1 + cut_carrier.roll_off) / 2),
-                          f_cut_resolution)  # Only positive f2 is used since integrand_f2 is symmetric
-
-        integrand_f1 = zeros(len(f1_array))
-        for f1_index, f1 in enumerate(f1_array):
-            delta_beta = 4 * pi**2 * (f1 - f_eval) * (f2_array - f_eval) * \
-                (beta2 + pi * beta3 * (f1 + f2_array - 2 * f_ref_beta))
-            integrand_f2 = self._generalized_rho_nli(delta_beta, rho_norm_pump, z, alpha0)
-            integrand_f1[f1_index] = 2 * trapz(integrand_f2, f2_array)  # 2x since integrand_f2 is symmetric in f2
-        generalized_psi = 0.5 * sum(integrand_f1) * pump_carrier.baud_rate
+
+        def integrand(f2):
+            f1_grid = f1_array.reshape((-1,) + (1,) * f2.ndim)
+            delta_beta = 4 * pi**2 * (f1_grid - f_eval) * (f2 - f_eval) * \
+                (beta2 + pi * beta3 * (f1_grid + f2 - 2 * f_ref_beta))
+            return sum(self._generalized_rho_nli(delta_beta, rho_norm_pump, z, alpha0), axis=0)
+
+        # Only positive f2 is used since the integrand is symmetric
+        f2_breakpoints = cut_carrier.frequency + raised_cosine_shape(cut_carrier.baud_rate, cut_carrier.roll_off) \
+            .breakpoints(positive=True)
+        if self._integration_method() == 'gauss_legendre':
+            f2_breakpoints = self._graded_breakpoints(f2_breakpoints, f_eval, alpha0, max(abs(f1_array - f_eval)))
+            integrand_f1 = 2 * self._gauss_legendre_quadrature(integrand, f2_breakpoints)
+        else:
+            f2_array = arange(f2_breakpoints[0], f2_breakpoints[-1], f_cut_resolution)
+            integrand_f2 = integrand(f2_array)
+            self.integrand_evaluations += integrand_f2.size
+            integrand_f1 = 2 * trapz(integrand_f2, f2_array)  # 2x since the integrand is symmetric in f2
+        generalized_psi = 0.5 * integrand_f1 * pump_carrier.baud_rate
         return generalized_psi
 
-    def _generalized_psi(self, cut_carrier, pump_carrier, f_eval, f_cut_resolution, f_pump_resolution):
+    def _generalized_psi(self, cut_carrier, pump_carrier, f_eval, f_cut_resolution, f_pump_resolution,
+                         max_chunk_size=2**20):
         """ It computes the generalized psi function similarly to the one used in the GN model
+        On the uniform grid, the f1 samples are processed in chunks so that each (f1 x f2) working array
+        holds at most max_chunk_size elements.
         :return: generalized_psi
         """
         # Fiber parameters
@@ -632,46 +1481,102 @@ class NliSolver:
         beta3 = self.fiber.params.beta3
         f_ref_beta = self.fiber.params.ref_frequency
         z = self.stimulated_raman_scattering.z
-        frequency_rho = self.stimulated_raman_scattering.frequency
-        rho_norm = self.stimulated_raman_scattering.rho * exp(abs(alpha0) * z / 2)
-        if len(frequency_rho) == 1:
-            def rho_function(f): return rho_norm[0, :]
+        rho_norm_pump = self.stimulated_raman_scattering.profile.rho_norm(pump_carrier.frequency, alpha0)
+
+        def integrand(f1, f2):
+            psd1 = raised_cosine_comb(f1, pump_carrier, normalized=True)
+            psd2 = raised_cosine_comb(f2, cut_carrier, normalized=True)
+            f3 = f1 + f2 - f_eval
+            psd3 = raised_cosine_comb(f3, pump_carrier, normalized=True)
+            ggg = psd1 * psd2 * psd3
+
+            delta_beta = 4 * pi**2 * (f1 - f_eval) * (f2 - f_eval) * \
+                (beta2 + pi * beta3 * (f1 + f2 - 2 * f_ref_beta))
+            return ggg * self._generalized_rho_nli(delta_beta, rho_norm_pump, z, alpha0)
+
+        f1_breakpoints = pump_carrier.frequency + \
+            raised_cosine_shape(pump_carrier.baud_rate, pump_carrier.roll_off).breakpoints()
+        f2_breakpoints = cut_carrier.frequency + raised_cosine_shape(cut_carrier.baud_rate, cut_carrier.roll_off) \
+            .breakpoints()
+        if self._integration_method() == 'gauss_legendre':
+            generalized_psi = self._gauss_legendre_quadrature(
+                integrand, self._graded_breakpoints(f1_breakpoints, f_eval, alpha0, max(abs(f2_breakpoints - f_eval))),
+                self._graded_breakpoints(f2_breakpoints, f_eval, alpha0, max(abs(f1_breakpoints - f_eval))))
         else:
-            rho_function = interp1d(frequency_rho, rho_norm, axis=0, fill_value='extrapolate')
-        rho_norm_pump = rho_function(pump_carrier.frequency)
-
-        f1_array = arange(pump_carrier.frequency - (pump_carrier.baud_rate * (1 + pump_carrier.roll_off) / 2),
-                          pump_carrier.frequency + (pump_carrier.baud_rate * (1 + pump_carrier.roll_off) / 2),
-                          f_pump_resolution)
-        f2_array = arange(cut_carrier.frequency - (cut_carrier.baud_rate * (1 + cut_carrier.roll_off) / 2),
-                          cut_carrier.frequency + (cut_carrier.baud_rate * (1 + cut_carrier.roll_off) / 2),
-                          f_cut_resolution)
-        psd1 = raised_cosine_comb(f1_array, pump_carrier) * (pump_carrier.baud_rate / pump_carrier.power.signal)
-
-        integrand_f1 = zeros(len(f1_array))
-        for f1_index, (f1, psd1_sample) in enumerate(zip(f1_array, psd1)):
-            f3_array = f1 + f2_array - f_eval
-            psd2 = raised_cosine_comb(f2_array, cut_carrier) * (cut_carrier.baud_rate / cut_carrier.power.signal)
-            psd3 = raised_cosine_comb(f3_array, pump_carrier) * (pump_carrier.baud_rate / pump_carrier.power.signal)
-            ggg = psd1_sample * psd2 * psd3
-
-            delta_beta = 4 * pi**2 * (f1 - f_eval) * (f2_array - f_eval) * \
-                (beta2 + pi * beta3 * (f1 + f2_array - 2 * f_ref_beta))
-
-            integrand_f2 = ggg * self._generalized_rho_nli(delta_beta, rho_norm_pump, z, alpha0)
-            integrand_f1[f1_index] = trapz(integrand_f2, f2_array)
-        generalized_psi = trapz(integrand_f1, f1_array)
+            f1_array = arange(f1_breakpoints[0], f1_breakpoints[-1], f_pump_resolution)
+            f2_array = arange(f2_breakpoints[0], f2_breakpoints[-1], f_cut_resolution)
+            integrand_f1 = empty(f1_array.shape)
+            chunk_length = max(1, max_chunk_size // max(1, len(f2_array)))
+            for start in range(0, len(f1_array), chunk_length):
+                # (f1 x f2) integration grid
+                integrand_f2 = integrand(f1_array[start:start + chunk_length, newaxis], f2_array)
+                self.integrand_evaluations += integrand_f2.size
+                integrand_f1[start:start + chunk_length] = trapz(integrand_f2, f2_array, axis=1)
+            generalized_psi = trapz(integrand_f1, f1_array)
         return generalized_psi
 
     @staticmethod
-    def _generalized_rho_nli(delta_beta, rho_norm_pump, z, alpha0):
-        w = 1j * delta_beta - alpha0
-        generalized_rho_nli = (rho_norm_pump[-1]**2 * exp(w * z[-1]) - rho_norm_pump[0]**2 * exp(w * z[0])) / w
-        for z_ind in range(0, len(z) - 1):
-            derivative_rho = (rho_norm_pump[z_ind + 1]**2 - rho_norm_pump[z_ind]**2) / (z[z_ind + 1] - z[z_ind])
-            generalized_rho_nli -= derivative_rho * (exp(w * z[z_ind + 1]) - exp(w * z[z_ind])) / (w**2)
-        generalized_rho_nli = abs(generalized_rho_nli)**2
-        return generalized_rho_nli
+    def _integration_method():
+        nli_params = Simulation.get_simulation().sim_params.nli_params
+        integration_method = nli_params.integration_method
+        if integration_method is None:
+            return 'uniform_grid'
+        integration_method = integration_method.lower()
+        if integration_method not in ('uniform_grid', 'gauss_legendre'):
+            raise ValueError(f'Integration method {nli_params.integration_method} not implemented.')
+        return integration_method
+
+    def _graded_breakpoints(self, breakpoints, f_eval, alpha0, max_frequency_offset):
+        """ Adds to the breakpoints of an integration axis a geometric sequence around f_eval. The generalized psi
+        integrand peaks where the phase mismatch vanishes, i.e. at f_eval, with a width down to
+        alpha0 / (4 pi^2 |beta2| max_frequency_offset), max_frequency_offset being the largest distance from f_eval
+        along the other axis: the finest panels are of this width and the following ones double up to the band edges.
+        """
+        lower, upper = breakpoints[0], breakpoints[-1]
+        if not lower <= f_eval <= upper:
+            return breakpoints
+        width = abs(alpha0) / (4 * pi**2 * abs(self.fiber.params.beta2) * max_frequency_offset)
+        steps = width * 2.**arange(max(0, int(ceil(log2((upper - lower) / width)))) + 1)
+        graded = concatenate([breakpoints, [f_eval], f_eval - steps, f_eval + steps])
+        return unique(clip(graded, lower, upper))
+
+    def _gauss_legendre_quadrature(self, integrand, *breakpoints):
+        """ Integrates the generalized psi integrand with `sim_params.nli_params.integration_tolerance` and records
+        the number of integrand evaluations in `self.integrand_evaluations`.
+        """
+        nli_params = Simulation.get_simulation().sim_params.nli_params
+        tolerance = nli_params.integration_tolerance if nli_params.integration_tolerance is not None else 1e-3
+        integral, evaluations = gauss_legendre_quadrature(integrand, *breakpoints, tolerance=tolerance)
+        self.integrand_evaluations += evaluations
+        logger.debug(f'Generalized psi integrated with {evaluations} integrand evaluations')
+        return integral
+
+    @staticmethod
+    def _generalized_rho_nli(delta_beta, rho_norm_pump, z, alpha0, max_chunk_size=2**20):
+        """ Computes the generalized rho function for all the phase mismatch values in delta_beta, with the
+        normalized pump power profile rho_norm_pump**2 linearly interpolated along z.
+        The delta_beta samples are processed in chunks so that each (delta_beta x z) working array
+        holds at most max_chunk_size elements.
+        :param delta_beta: phase mismatch [1/m]. numpy ndarray of any shape
+        :param rho_norm_pump: normalized field profile of the pump along z. numpy array
+        :param z: spatial axis [m]. numpy array
+        :param alpha0: fiber attenuation [Neper/m]
+        :param max_chunk_size: maximum number of elements of the working arrays
+        :return: generalized_rho_nli: numpy ndarray with the same shape of delta_beta
+        """
+        delta_beta = asarray(delta_beta, dtype=float)
+        rho_square = rho_norm_pump**2
+        derivative_rho = diff(rho_square) / diff(z)
+        delta_beta_samples = delta_beta.reshape(-1)
+        generalized_rho_nli = empty(delta_beta_samples.shape)
+        chunk_length = max(1, max_chunk_size // len(z))
+        for start in range(0, delta_beta_samples.size, chunk_length):
+            w = 1j * delta_beta_samples[start:start + chunk_length] - alpha0
+            exp_wz = exp(w[:, newaxis] * z)
+            rho_nli = (rho_square[-1] * exp_wz[:, -1] - rho_square[0] * exp_wz[:, 0]) / w
+            rho_nli -= (diff(exp_wz, axis=1) @ derivative_rho) / (w**2)
+            generalized_rho_nli[start:start + chunk_length] = abs(rho_nli)**2
+        return generalized_rho_nli.reshape(delta_beta.shape)
 
     def _frequency_offset_threshold(self, symbol_rate):
         k_ref = 5
@@ -683,17 +1588,141 @@ class NliSolver:
         return freq_offset_th
 
 
-def _psi(carrier, interfering_carrier, beta2, asymptotic_length):
-    """Calculates eq. 123 from `arXiv:1209.0394 <https://arxiv.org/abs/1209.0394>`__"""
-    if carrier.channel_number == interfering_carrier.channel_number:  # SCI, SPM
-        psi = arcsinh(0.5 * pi**2 * asymptotic_length * abs(beta2) * carrier.baud_rate**2)
-    else:  # XCI, XPM
-        delta_f = carrier.frequency - interfering_carrier.frequency
-        psi = arcsinh(pi**2 * asymptotic_length * abs(beta2) *
-                      carrier.baud_rate * (delta_f + 0.5 * interfering_carrier.baud_rate))
-        psi -= arcsinh(pi**2 * asymptotic_length * abs(beta2) *
-                       carrier.baud_rate * (delta_f - 0.5 * interfering_carrier.baud_rate))
-    return psi
+def gn_analytic_nli(cut_carriers, carriers, fiber_params):
+    """ Computes the nonlinear interference power on several carriers under test at once.
+    The method uses eq. 120 from `arXiv:1209.0394 <https://arxiv.org/abs/1209.0394>`__, with the psi
+    terms of eq. 123 evaluated as a single CUT x interferer matrix.
+    :param cut_carriers: the signals under analysis
+    :param carriers: the full WDM comb
+    :param fiber_params: instance of parameters.py/FiberParams
+    :return: carriers_nli: numpy array of the nonlinear interference in W on each carrier under analysis
+    """
+    cut_channel_number = array([c.channel_number for c in cut_carriers])
+    cut_baud_rate = array([c.baud_rate for c in cut_carriers], dtype=float)
+    cut_frequency = array([c.frequency for c in cut_carriers], dtype=float)
+    cut_signal = array([c.power.signal for c in cut_carriers], dtype=float)
+    channel_number = array([c.channel_number for c in carriers])
+    baud_rate = array([c.baud_rate for c in carriers], dtype=float)
+    frequency = array([c.frequency for c in carriers], dtype=float)
+    signal = array([c.power.signal for c in carriers], dtype=float)
+    return _gn_analytic_nli(cut_channel_number, cut_frequency, cut_baud_rate, cut_signal,
+                            channel_number, frequency, baud_rate, signal, fiber_params)
+
+
+def spectral_gn_analytic_nli(spectral_info, fiber_params):
+    """ Computes the nonlinear interference power on all the channels of a spectral information with the method of
+    gn_analytic_nli. The psi matrix of the channel plan is shared by all the scenarios of the spectral information.
+    :param spectral_info: instance of info.py/SpectralInformation, of one or several scenarios
+    :param fiber_params: instance of parameters.py/FiberParams
+    :return: carriers_nli: numpy array of the nonlinear interference in W on each channel, of the shape of the signal
+        power of the spectral information
+    """
+    return _gn_analytic_nli(spectral_info.channel_number, spectral_info.frequency, spectral_info.baud_rate,
+                            spectral_info.signal, spectral_info.channel_number, spectral_info.frequency,
+                            spectral_info.baud_rate, spectral_info.signal, fiber_params)
+
+
+def _gn_analytic_nli(cut_channel_number, cut_frequency, cut_baud_rate, cut_signal, channel_number, frequency,
+                     baud_rate, signal, fiber_params):
+    """ Computes the nonlinear interference power of gn_analytic_nli on arrays of the channel parameters. The signal
+    powers can have a leading scenario axis.
+    """
+    beta2 = fiber_params.beta2
+    asymptotic_length = fiber_params.asymptotic_length
+
+    g_cut = cut_signal / cut_baud_rate
+    g_interfering = signal / baud_rate
+
+    psi = _psi(cut_channel_number, cut_frequency, cut_baud_rate, channel_number, frequency, baud_rate,
+               beta2=beta2, asymptotic_length=asymptotic_length)
+    g_nli = g_cut * (psi @ g_interfering.T**2).T
+    g_nli *= (16.0 / 27.0) * (fiber_params.gamma * fiber_params.effective_length) ** 2 / \
+        (2 * pi * abs(beta2) * asymptotic_length)
+    carriers_nli = cut_baud_rate * g_nli
+    return carriers_nli
+
+
+def srs_closed_form_nli(cut_carriers, carriers, fiber, stimulated_raman_scattering):
+    """ Computes the nonlinear interference power on several carriers under test with a closed-form approximation of
+    the GGN model accounting for the SRS power profiles, in the spirit of the ISRS GN model closed form of
+    `arXiv:1808.07940 <https://arxiv.org/abs/1808.07940>`__.
+    The normalized power profile of each carrier is fitted in least squares to
+    exp(-alpha z) (1 + T (1 - exp(-alpha z))) + G exp(s (z - L)), alpha being the fiber attenuation at the carrier
+    frequency and s the slope of the profile at the fiber output, so that its generalized rho function is a sum of
+    three Lorentzian terms. Each term is integrated over the CUT and interferer bands as in eq. 120 of
+    `arXiv:1209.0394 <https://arxiv.org/abs/1209.0394>`__, with the local dispersion of the carrier pair. The cost is
+    O(N^2) closed-form evaluations for N carriers.
+    :param cut_carriers: the signals under analysis
+    :param carriers: the full WDM comb
+    :param fiber: instance of elements.py/Fiber
+    :param stimulated_raman_scattering: SRS solution of the fiber span, including the carriers frequencies
+    :return: carriers_nli: numpy array of the nonlinear interference in W on each carrier under analysis
+    """
+    beta2 = fiber.params.beta2
+    beta3 = fiber.params.beta3
+    f_ref_beta = fiber.params.ref_frequency
+    z = stimulated_raman_scattering.z
+
+    cut_channel_number = array([c.channel_number for c in cut_carriers])
+    cut_baud_rate = array([c.baud_rate for c in cut_carriers], dtype=float)
+    cut_frequency = array([c.frequency for c in cut_carriers], dtype=float)
+    g_cut = array([c.power.signal for c in cut_carriers], dtype=float) / cut_baud_rate
+    channel_number = array([c.channel_number for c in carriers])
+    baud_rate = array([c.baud_rate for c in carriers], dtype=float)
+    frequency = array([c.frequency for c in carriers], dtype=float)
+    g_interfering = array([c.power.signal for c in carriers], dtype=float) / baud_rate
+
+    # least squares fit of the power profiles:
+    # power_profile - decay = srs_tilt * decay * (1 - decay) + end_gain * growth,
+    # the growth towards the fiber output, e.g. due to counter-propagating pumps, following the slope of the last step
+    power_profile = stimulated_raman_scattering.profile.rho(frequency)**2
+    alpha = fiber.alpha(frequency)
+    length = z[-1]
+    decay = exp(-alpha[:, newaxis] * z)
+    end_slope = maximum(alpha, log(power_profile[:, -1] / power_profile[:, -2]) / (z[-1] - z[-2]))
+    growth = exp(end_slope[:, newaxis] * (z - length))
+    basis = array([decay * (1 - decay), growth])
+    normal_matrix = einsum('inz,jnz->nij', basis, basis)
+    normal_vector = einsum('inz,nz->ni', basis, power_profile - decay)
+    srs_tilt, end_gain = solve(normal_matrix, normal_vector[:, :, newaxis])[:, :, 0].T
+
+    # The profile is the sum of the terms coefficient_j exp(-exponent_j z), localized at the fiber input, and of
+    # end_gain exp(end_slope (z - length)), localized at the fiber output. Neglecting the interference between the two
+    # groups, rho_nli(delta_beta) ~ sum_j weight_j exponent_j / (exponent_j^2 + delta_beta^2), with
+    # weight_j = 2 coefficient_j sum_l coefficient_l / (exponent_j + exponent_l) for the input terms.
+    coefficient = array([1 + srs_tilt, -srs_tilt])
+    exponent = array([alpha, 2 * alpha])
+    weight = 2 * coefficient * sum(coefficient[newaxis, :, :] /
+                                   (exponent[:, newaxis, :] + exponent[newaxis, :, :]), axis=1)
+    # finite span length: scaling to the squared integral of each group over the span
+    input_length = sum(coefficient * (1 - exp(-exponent * length)) / exponent, axis=0)
+    weight *= input_length**2 / sum(coefficient / exponent, axis=0)**2
+    weight = append(weight, [end_gain**2 / end_slope * (1 - exp(-end_slope * length))**2], axis=0)
+    exponent = append(exponent, [end_slope], axis=0)
+
+    local_beta2 = abs(beta2 + pi * beta3 * (cut_frequency[:, newaxis] + frequency[newaxis, :] - 2 * f_ref_beta))
+    eta = zeros((len(cut_carriers), len(carriers)))
+    for weight_j, exponent_j in zip(weight, exponent):
+        psi = _psi(cut_channel_number, cut_frequency, cut_baud_rate, channel_number, frequency, baud_rate,
+                   beta2=local_beta2, asymptotic_length=1 / exponent_j[newaxis, :])
+        eta += weight_j * psi
+    eta *= (16.0 / 27.0) * fiber.params.gamma**2 / (2 * pi * local_beta2)
+    carriers_nli = cut_baud_rate * g_cut * (eta @ g_interfering**2)
+    return carriers_nli
+
+
+def _psi(cut_channel_number, cut_frequency, cut_baud_rate, channel_number, frequency, baud_rate, beta2,
+         asymptotic_length):
+    """Calculates eq. 123 from `arXiv:1209.0394 <https://arxiv.org/abs/1209.0394>`__ for every pair of
+    carrier under test (rows) and interfering carrier (columns)"""
+    coefficient = pi**2 * asymptotic_length * abs(beta2) * cut_baud_rate[:, newaxis]
+    delta_f = cut_frequency[:, newaxis] - frequency[newaxis, :]
+    # XCI, XPM
+    psi = arcsinh(coefficient * (delta_f + 0.5 * baud_rate[newaxis, :])) - \
+        arcsinh(coefficient * (delta_f - 0.5 * baud_rate[newaxis, :]))
+    # SCI, SPM
+    psi_spm = arcsinh(0.5 * coefficient * cut_baud_rate[:, newaxis])
+    return where(cut_channel_number[:, newaxis] == channel_number[newaxis, :], psi_spm, psi)
 
 
 def estimate_nf_model(type_variety, gain_min, gain_max, nf_min, nf_max):
@@ -22,12 +22,13 @@ from gnpy.core.equipment import trx_mode_params
 import gnpy.core.exceptions as exceptions
 from gnpy.core.network import build_network
 from gnpy.core.parameters import SimParams
-from gnpy.core.science_utils import Simulation
+from gnpy.core.science_utils import Simulation, nli_cache, raman_cache
 from gnpy.core.utils import db2lin, lin2db, automatic_nch
 from gnpy.topology.request import (ResultElement, jsontocsv, compute_path_dsjctn, requests_aggregation,
                                    BLOCKING_NOPATH, correct_json_route_list,
                                    deduplicate_disjunctions, compute_path_with_disjunction,
-                                   PathRequest, compute_constrained_path, propagate)
+                                   PathRequest, compute_constrained_path, propagate,
+                                   propagate_power_sweep)
 from gnpy.topology.spectrum_assignment import build_oms_list, pth_assign_spectrum
 from gnpy.tools.json_io import load_equipment, load_network, load_json, load_requests, save_network, \
                                requests_from_json, disjunctions_from_json, save_json
@@ -49,7 +50,8 @@ def show_example_data_dir():
     print(f'{_examples_dir}/')
 
 
-def load_common_data(equipment_filename, topology_filename, simulation_filename, save_raw_network_filename):
+def load_common_data(equipment_filename, topology_filename, simulation_filename, save_raw_network_filename,
+                     workers=None):
     '''Load common configuration from JSON files'''
 
     try:
@@ -58,7 +60,21 @@ def load_common_data(equipment_filename, topology_filename, simulation_filename,
         if save_raw_network_filename is not None:
             save_network(network, save_raw_network_filename)
             print(f'{ansi_escapes.blue}Raw network (no optimizations) saved to {save_raw_network_filename}{ansi_escapes.reset}')
-        sim_params = SimParams(**load_json(simulation_filename)) if simulation_filename is not None else None
+        if simulation_filename is not None:
+            sim_params_json = load_json(simulation_filename)
+            if workers is not None:
+                if 'nli_parameters' not in sim_params_json:
+                    print(f'{ansi_escapes.red}Invocation error:{ansi_escapes.reset} '
+                          f'--workers requires the nli_parameters in the simulation params {simulation_filename}')
+                    sys.exit(1)
+                sim_params_json['nli_parameters']['workers'] = workers
+            sim_params = SimParams(**sim_params_json)
+        elif workers is not None:
+            print(f'{ansi_escapes.red}Invocation error:{ansi_escapes.reset} '
+                  f'--workers requires passing simulation params via --sim-params')
+            sys.exit(1)
+        else:
+            sim_params = None
         if not sim_params:
             if next((node for node in network if isinstance(node, RamanFiber)), None) is not None:
                 print(f'{ansi_escapes.red}Invocation error:{ansi_escapes.reset} '
@@ -89,6 +105,11 @@ def _setup_logging(args):
     logging.basicConfig(level={2: logging.DEBUG, 1: logging.INFO, 0: logging.CRITICAL}.get(args.verbose, logging.DEBUG))
 
 
+def _setup_raman_cache(args):
+    raman_cache.directory = args.raman_cache
+    raman_cache.max_size = args.raman_cache_size * 2**20
+
+
 def _add_common_options(parser: argparse.ArgumentParser, network_default: Path):
     parser.add_argument('topology', nargs='?', type=Path, metavar='NETWORK-TOPOLOGY.(json|xls|xlsx)',
                         default=network_default,
@@ -100,6 +121,14 @@ def _add_common_options(parser: argparse.ArgumentParser, network_default: Path):
     parser.add_argument('--sim-params', type=Path, metavar=_help_fname_json,
                         default=None, help='Path to the JSON containing simulation parameters (required for Raman). '
                                            f'Example: {_examples_dir / "sim_params.json"}')
+    parser.add_argument('--workers', type=int, metavar='N', default=None,
+                        help='Number of processes computing the NLI of Raman fiber spans in parallel '
+                             '(overrides the simulation parameters)')
+    parser.add_argument('--raman-cache', type=Path, metavar='DIR', default=None,
+                        help='Directory of a disk cache of the Raman scattering solutions, reused among the runs '
+                             '(disabled by default)')
+    parser.add_argument('--raman-cache-size', type=int, metavar='MB', default=512,
+                        help='Maximum size of the Raman cache directory')
     parser.add_argument('--save-network', type=Path, metavar=_help_fname_json,
                         help='Save the final network as a JSON file')
     parser.add_argument('--save-network-before-autodesign', type=Path, metavar=_help_fname_json,
@@ -122,8 +151,16 @@ def transmission_main_example(args=None):
 
     args = parser.parse_args(args if args is not None else sys.argv[1:])
     _setup_logging(args)
+    _setup_raman_cache(args)
+    try:
+        _transmission_main_example(args)
+    finally:
+        Simulation.shutdown_nli_executor()
+
 
-    (equipment, network) = load_common_data(args.equipment, args.topology, args.sim_params, args.save_network_before_autodesign)
+def _transmission_main_example(args):
+    (equipment, network) = load_common_data(args.equipment, args.topology, args.sim_params,
+                                            args.save_network_before_autodesign, args.workers)
 
     if args.plot:
         plot_baseline(network)
@@ -226,23 +263,34 @@ def transmission_main_example(args=None):
     if not power_mode:
         # power cannot be changed in gain mode
         power_range = [0]
-    for dp_db in power_range:
-        req.power = db2lin(pref_ch_db + dp_db) * 1e-3
+    if len(power_range) == 1:
+        req.power = db2lin(pref_ch_db + power_range[0]) * 1e-3
         if power_mode:
             print(f'\nPropagating with input power = {ansi_escapes.cyan}{lin2db(req.power*1e3):.2f} dBm{ansi_escapes.reset}:')
         else:
             print(f'\nPropagating in {ansi_escapes.cyan}gain mode{ansi_escapes.reset}: power cannot be set manually')
         infos = propagate(path, req, equipment)
-        if len(power_range) == 1:
-            for elem in path:
-                print(elem)
-            if power_mode:
-                print(f'\nTransmission result for input power = {lin2db(req.power*1e3):.2f} dBm:')
-            else:
-                print(f'\nTransmission results:')
-            print(f'  Final SNR total (0.1 nm): {ansi_escapes.cyan}{mean(destination.snr_01nm):.02f} dB{ansi_escapes.reset}')
+        receiver = path[-1]
+        for elem in path:
+            print(elem)
+        if power_mode:
+            print(f'\nTransmission result for input power = {lin2db(req.power*1e3):.2f} dBm:')
         else:
-            print(path[-1])
+            print(f'\nTransmission results:')
+        print(f'  Final SNR total (0.1 nm): {ansi_escapes.cyan}{mean(destination.snr_01nm):.02f} dB'
+              f'{ansi_escapes.reset}')
+    else:
+        # all the powers of the sweep are propagated at once
+        powers = [db2lin(pref_ch_db + dp_db) * 1e-3 for dp_db in power_range]
+        sweep_infos = propagate_power_sweep(path, req, equipment, powers)
+        for index, power in enumerate(powers):
+            print(f'\nPropagating with input power = {ansi_escapes.cyan}{lin2db(power*1e3):.2f} dBm'
+                  f'{ansi_escapes.reset}:')
+            print(path[-1].scenario(index))
+        req.power = powers[-1]
+        infos = sweep_infos.scenario(-1)
+        receiver = path[-1].scenario(-1)
+    _logger.info(f'Raman cache: {raman_cache.hits} hits, {raman_cache.misses} misses')
 
     if args.save_network is not None:
         save_network(network, args.save_network)
@@ -259,7 +307,7 @@ def transmission_main_example(args=None):
                 'SNR NLI (signal bw, dB)',
                 'SNR total (signal bw, dB)'))
         for final_carrier, ch_osnr, ch_snr_nl, ch_snr in zip(
-                infos.carriers, path[-1].osnr_ase, path[-1].osnr_nli, path[-1].snr):
+                infos.carriers, receiver.osnr_ase, receiver.osnr_nli, receiver.snr):
             ch_freq = final_carrier.frequency * 1e-12
             ch_power = lin2db(final_carrier.power.signal * 1e3)
             print(
@@ -303,14 +351,30 @@ def path_requests_run(args=None):
                         help='considers that all demands are bidir')
     parser.add_argument('-o', '--output', type=Path, metavar=_help_fname_json_csv,
                         help='Store satisifed requests into a JSON or CSV file')
+    parser.add_argument('--nli-cache-size', type=int, metavar='N', default=1024,
+                        help='Number of span NLI computations shared among the requests (0 disables the cache)')
 
     args = parser.parse_args(args if args is not None else sys.argv[1:])
     _setup_logging(args)
+    _setup_raman_cache(args)
+    # the NLI cache is shared by the requests of this run only
+    nli_cache_size = nli_cache.max_size
+    nli_cache.clear()
+    nli_cache.max_size = args.nli_cache_size
+    try:
+        _path_requests_run(args)
+    finally:
+        nli_cache.clear()
+        nli_cache.max_size = nli_cache_size
+        Simulation.shutdown_nli_executor()
+
 
+def _path_requests_run(args):
     _logger.info(f'Computing path requests {args.service_filename} into JSON format')
     print(f'{ansi_escapes.blue}Computing path requests {os.path.relpath(args.service_filename)} into JSON format{ansi_escapes.reset}')
 
-    (equipment, network) = load_common_data(args.equipment, args.topology, args.sim_params, args.save_network_before_autodesign)
+    (equipment, network) = load_common_data(args.equipment, args.topology, args.sim_params,
+                                            args.save_network_before_autodesign, args.workers)
 
     # Build the network once using the default power defined in SI in eqpt config
     # TODO power density: db2linp(ower_dbm": 0)/power_dbm": 0 * nb channels as defined by
@@ -382,6 +446,8 @@ def path_requests_run(args=None):
     # so there can not be propagation on these nodes.
 
     pth_assign_spectrum(pths, rqs, oms_list, reversed_pths)
+    _logger.info(f'NLI cache: {nli_cache.hits} hits, {nli_cache.misses} misses')
+    _logger.info(f'Raman cache: {raman_cache.hits} hits, {raman_cache.misses} misses')
 
     print(f'{ansi_escapes.blue}Result summary{ansi_escapes.reset}')
     header = ['req id', '  demand', '  snr@bandwidth A-Z (Z-A)', '  snr@0.1nm A-Z (Z-A)',
@@ -23,7 +23,7 @@ from networkx.utils import pairwise
 from numpy import mean
 from gnpy.core.elements import Transceiver, Roadm
 from gnpy.core.utils import lin2db
-from gnpy.core.info import create_input_spectral_information
+from gnpy.core.info import SpectralInformation, SpectralInformationBuffer, create_input_spectral_information
 from gnpy.core.exceptions import ServiceError, DisjunctionError
 import gnpy.core.ansi_escapes as ansi_escapes
 from copy import deepcopy
@@ -329,15 +329,46 @@ def compute_constrained_path(network, req):
     return total_path
 
 
-def propagate(path, req, equipment):
+def propagate(path, req, equipment, in_place=False, snapshots=None):
+    """ Propagates the spectrum of the request through the path.
+
+    :param in_place: the elements transform a single working buffer in place, allocated once, instead of returning
+        a new spectral information each
+    :param snapshots: optional dict whose keys are the uids of the elements to observe: the spectral information at
+        the output of each of these elements is recorded as its value
+    :return: the spectral information at the end of the path, the working buffer if in_place
+    """
     si = create_input_spectral_information(
         req.f_min, req.f_max, req.roll_off, req.baud_rate,
         req.power, req.spacing)
+    return _propagate_spectral_information(path, si, req, equipment, in_place, snapshots)
+
+
+def propagate_power_sweep(path, req, equipment, powers, in_place=False, snapshots=None):
+    """ Propagates in a single walk through the path the spectrum of the request at each of the channel powers, e.g.
+    the power range of a power sweep. The Transceiver at the end of the path records scenarios x channels tables
+    of SNR, see Transceiver.scenario to select the results of one of the powers.
+
+    :param powers: channel powers in W, one per scenario
+    :param in_place: see propagate
+    :param snapshots: see propagate
+    :return: the spectral information at the end of the path of all the scenarios
+    """
+    si = SpectralInformation.stack([create_input_spectral_information(
+        req.f_min, req.f_max, req.roll_off, req.baud_rate, power, req.spacing) for power in powers])
+    return _propagate_spectral_information(path, si, req, equipment, in_place, snapshots)
+
+
+def _propagate_spectral_information(path, si, req, equipment, in_place=False, snapshots=None):
+    if in_place:
+        si = SpectralInformationBuffer.from_spectral_information(si)
     for i, el in enumerate(path):
         if isinstance(el, Roadm):
             si = el(si, degree=path[i+1].uid)
         else:
             si = el(si)
+        if snapshots is not None and el.uid in snapshots:
+            snapshots[el.uid] = si.snapshot()
     path[0].update_snr(req.tx_osnr)
     if any(isinstance(el, Roadm) for el in path):
         path[-1].update_snr(req.tx_osnr, equipment['Roadm']['default'].add_drop_osnr)
@@ -366,9 +397,8 @@ def propagate_and_optimize_mode(path, req, equipment):
             # step2: computes propagation for each baudrate: stop and select the first that passes
             # TODO: the case of roll of is not included: for now use SI one
             # TODO: if the loop in mode optimization does not have a feasible path, then bugs
-            spc_info = create_input_spectral_information(req.f_min, req.f_max,
-                                                         equipment['SI']['default'].roll_off,
-                                                         this_br, req.power, req.spacing)
+            spc_info = SpectralInformationBuffer.from_spectral_information(create_input_spectral_information(
+                req.f_min, req.f_max, equipment['SI']['default'].roll_off, this_br, req.power, req.spacing))
             for i, el in enumerate(path):
                 if isinstance(el, Roadm):
                     spc_info = el(spc_info, degree=path[i+1].uid)
@@ -1095,7 +1125,7 @@ def compute_path_with_disjunction(network, equipment, pathreqlist, pathlist):
             if pathreq.baud_rate is not None:
                 # means that at this point the mode was entered/forced by user and thus a
                 # baud_rate was defined
-                propagate(total_path, pathreq, equipment)
+                propagate(total_path, pathreq, equipment, in_place=True)
                 temp_snr01nm = round(mean(total_path[-1].snr+lin2db(pathreq.baud_rate/(12.5e9))), 2)
                 if temp_snr01nm < pathreq.OSNR + equipment['SI']['default'].sys_margins:
                     msg = f'\tWarning! Request {pathreq.request_id} computed path from' +\
@@ -1139,7 +1169,7 @@ def compute_path_with_disjunction(network, equipment, pathreqlist, pathlist):
 
                 print(f'\n\tPropagating Z to A direction {pathreq.destination} to {pathreq.source}')
                 print(f'\tPath (roadsm) {[r.uid for r in rev_p if isinstance(r,Roadm)]}\n')
-                propagate(rev_p, pathreq, equipment)
+                propagate(rev_p, pathreq, equipment, in_place=True)
                 propagated_reversed_path = rev_p
                 temp_snr01nm = round(mean(propagated_reversed_path[-1].snr +\
                                           lin2db(pathreq.baud_rate/(12.5e9))), 2)
@@ -4,6 +4,7 @@ from pathlib import Path
 import os
 import pytest
 import subprocess
+from gnpy.core.science_utils import nli_cache
 from gnpy.tools.cli_examples import transmission_main_example, path_requests_run
 
 SRC_ROOT = Path(__file__).parent.parent
@@ -25,6 +26,8 @@ def test_example_invocation(capfdbinary, output, handler, args):
     captured = capfdbinary.readouterr()
     assert captured.out == expected
     assert captured.err == b''
+    # the NLI cache of the spans does not outlive the run
+    assert nli_cache.max_size == 0 and not len(nli_cache)
 
 
 @pytest.mark.parametrize('program', ('gnpy-transmission-example', 'gnpy-path-request'))
@@ -43,3 +46,17 @@ def test_conversion_xls():
         stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, universal_newlines=True)
     assert proc.stderr == ''
     assert '/dev/null' in proc.stdout
+
+
+@pytest.mark.parametrize("with_sim_params", (False, True))
+def test_workers_invocation_error(tmp_path, capfdbinary, with_sim_params):
+    '''--workers overrides the NLI parameters of the simulation, it fails without them'''
+    os.chdir(SRC_ROOT)
+    args = ['--workers', '2']
+    if with_sim_params:
+        sim_params = tmp_path / 'sim_params.json'
+        sim_params.write_text('{"raman_parameters": {"flag_raman": true, "space_resolution": 10e3, "tolerance": 1e-8}}')
+        args += ['--sim', str(sim_params)]
+    with pytest.raises(SystemExit):
+        transmission_main_example(args)
+    assert b'--workers requires' in capfdbinary.readouterr().out
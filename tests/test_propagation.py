@@ -4,14 +4,17 @@
 # @Date:   2018-02-02 14:06:55
 
 import pytest
-from gnpy.core.elements import Transceiver, Fiber, Edfa, Roadm
+from gnpy.core.elements import Transceiver, Fiber, Edfa, RamanFiber, Roadm
 from gnpy.core.utils import db2lin
-from gnpy.core.info import create_input_spectral_information
+from gnpy.core.info import SpectralInformation, SpectralInformationBuffer, create_input_spectral_information
 from gnpy.core.network import build_network
-from gnpy.tools.json_io import load_network, load_equipment
+from gnpy.core.parameters import SimParams
+from gnpy.core.science_utils import Simulation
+from gnpy.tools.json_io import load_json, load_network, load_equipment
 from pathlib import Path
+from copy import copy, deepcopy
 from networkx import dijkstra_path
-from numpy import mean, sqrt, ones
+from numpy import array, mean, sqrt, ones
 
 network_file_name = Path(__file__).parent.parent / 'tests/LinkforTest.json'
 eqpt_library_name = Path(__file__).parent.parent / 'tests/data/eqpt_config.json'
@@ -123,6 +126,176 @@ def test_dgd(dgd_test, dest):
     assert pmd == pytest.approx(expected_pmd)
 
 
+def test_spectral_information_carriers():
+    """The carriers view matches the arrays of the spectral information, and the elements leave their input
+    unchanged"""
+    si = create_input_spectral_information(191.3e12, 191.3e12 + 79 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    assert len(si.carriers) == len(si.frequency) == 79
+    assert [c.frequency for c in si.carriers] == list(si.frequency)
+    assert [c.power.signal for c in si.carriers] == list(si.signal)
+    assert si._replace(carriers=si.carriers[1:]).frequency.tolist() == si.frequency[1:].tolist()
+    # the former (pref, carriers) construction and unpacking
+    for si_carriers in (SpectralInformation(pref=si.pref, carriers=si.carriers), SpectralInformation(*si)):
+        pref, carriers = si_carriers
+        assert pref == si.pref and carriers == si.carriers
+        assert si_carriers.signal.tolist() == si.signal.tolist()
+
+    _, _, path = propagation(0, 1, 0, 'trx B')
+    fiber = next(el for el in path if isinstance(el, Fiber))
+    si_out = fiber(si)
+    assert si.signal.tolist() == [1e-3] * 79 and not si.nli.any() and not si.chromatic_dispersion.any()
+    assert [c.power.nli for c in si_out.carriers] == list(si_out.nli)
+    assert si_out.pref.p_spani == fiber.pch_out_db
+
+
+def test_scenarios():
+    """Several launch powers propagated at once give the results of each power propagated alone"""
+    spacing = 50e9
+    powers = [db2lin(p) * 1e-3 for p in (-2, 0, 3)]
+    spectral_infos = [create_input_spectral_information(191.3e12, 191.3e12 + 79 * spacing, 0.15, 32e9, p, spacing)
+                      for p in powers]
+    sink, _, path = propagation(0, 1, 0, 'trx F')
+    expected_snr = []
+    expected_signal = []
+    for si in spectral_infos:
+        for el in path:
+            si = el(si)
+        expected_snr.append(sink.snr)
+        expected_signal.append(si.signal)
+    edfa_attributes = ('pin_db', 'pout_db', 'nf', 'gprofile', 'effective_gain', 'effective_pch_out_db')
+    roadm_attributes = ('effective_pch_out_db', 'effective_loss')
+    fiber_attributes = ('pch_out_db',)
+
+    def attribute_names(el):
+        return edfa_attributes if isinstance(el, Edfa) else roadm_attributes if isinstance(el, Roadm) \
+            else fiber_attributes if isinstance(el, Fiber) else ()
+    expected_attributes = [[getattr(el, attribute) for attribute in attribute_names(el)] for el in path]
+
+    si = SpectralInformation.stack(spectral_infos)
+    assert si.scenarios == 3
+    for el in path:
+        si = el(si) if not isinstance(el, Roadm) else el(si, degree=None)
+    # the amplifiers, ROADMs and fibers describe the last scenario, as after successive propagations
+    for el, attributes in zip(path, expected_attributes):
+        for name, expected_value in zip(attribute_names(el), attributes):
+            assert getattr(el, name) == pytest.approx(expected_value, rel=1e-12)
+        if isinstance(el, Fiber):
+            assert isinstance(el.pch_out_db, float)
+            str(el)
+    assert array(sink.snr).shape == (3, 79)
+    assert str(sink).count('Scenario') == 3
+    assert sink.scenario(1).snr == pytest.approx(expected_snr[1], rel=1e-12)
+    assert array(sink.snr) == pytest.approx(array(expected_snr), rel=1e-12)
+    assert si.signal == pytest.approx(array(expected_signal), rel=1e-12)
+    assert si.scenario(-1).carriers[0].power.signal == pytest.approx(expected_signal[-1][0], rel=1e-12)
+    with pytest.raises(ValueError):
+        si.carriers
+
+
+def test_scenarios_roadm_and_gain_mode():
+    """The ROADMs and the amplifiers in gain mode, saturated by one of the scenarios, propagate several launch powers
+    at once as successive propagations of each power"""
+    spacing = 50e9
+    spectral_infos = [create_input_spectral_information(191.3e12, 191.3e12 + 79 * spacing, 0.15, 32e9,
+                                                        db2lin(p) * 1e-3, spacing) for p in (-2, 4, 0)]
+    _, _, path = propagation(0, 1, 0, 'trx F')
+    edfa = next(el for el in path if isinstance(el, Edfa))
+    edfa.delta_p = None
+    edfa.params.p_max = 20
+    roadm = Roadm(uid='roadm', params={'target_pch_out_db': -20, 'add_drop_osnr': 38, 'pmd': 0,
+                                       'restrictions': {}, 'per_degree_pch_out_db': {'degree 2': -21}})
+    elements = [path[1], deepcopy(edfa), roadm]
+
+    expected_si = []
+    for si in spectral_infos:
+        for el in elements:
+            si = el(si) if el is not roadm else el(si, degree='degree 2')
+        expected_si.append(si)
+    expected_attributes = [copy(el.__dict__) for el in elements[1:]]
+
+    si = SpectralInformation.stack(spectral_infos)
+    elements[1] = deepcopy(edfa)
+    for el in elements:
+        si = el(si) if el is not roadm else el(si, degree='degree 2')
+    # saturated by the second scenario, the gain remains reduced in the third one
+    assert elements[1].effective_gain < edfa.effective_gain
+    for index, expected in enumerate(expected_si):
+        assert array(si.scenario(index).pref) == pytest.approx(array(expected.pref), rel=1e-12)
+        for field in ('signal', 'nli', 'ase'):
+            assert getattr(si, field)[index] == pytest.approx(getattr(expected, field), rel=1e-12)
+    for el, expected in zip(elements[1:], expected_attributes):
+        for attribute in ('pin_db', 'pout_db', 'nf', 'gprofile', 'effective_gain', 'effective_pch_out_db',
+                          'effective_loss'):
+            if attribute in expected:
+                assert getattr(el, attribute) == pytest.approx(expected[attribute], rel=1e-12)
+
+
+def in_place_path(name):
+    """Input spectral information and elements, with their propagation arguments, of the paths propagated in place"""
+    spacing = 50e9
+    if name == 'raman span':
+        sim_params = load_json(Path(__file__).parent / 'data' / 'sim_params.json')
+        sim_params['nli_parameters']['nli_method_name'] = 'gn_model_analytic'
+        Simulation.set_params(SimParams(**sim_params))
+        fiber = RamanFiber(**load_json(Path(__file__).parent / 'data' / 'raman_fiber_config.json'))
+        si_input = create_input_spectral_information(191.3e12, 191.3e12 + 20 * spacing, 0.15, 32e9, 1e-3, spacing)
+        return si_input, [(fiber, {})]
+    si_input = create_input_spectral_information(191.3e12, 191.3e12 + 79 * spacing, 0.15, 32e9, 1e-3, spacing)
+    _, _, path = propagation(0, 1, 0, 'trx F')
+    if name == 'roadm path':
+        roadm = Roadm(uid='roadm', params={'target_pch_out_db': -20, 'add_drop_osnr': 38, 'pmd': 0,
+                                           'restrictions': {}, 'per_degree_pch_out_db': {'degree 2': -21}})
+        edfa = next(el for el in path if isinstance(el, Edfa))
+        return si_input, [(path[1], {}), (edfa, {}), (roadm, {'degree': 'degree 2'}), (path[1], {})]
+    return si_input, [(el, {}) for el in path]
+
+
+@pytest.mark.parametrize("scenarios", [False, True])
+@pytest.mark.parametrize("name", ['fiber path', 'raman span', 'roadm path'])
+def test_in_place_propagation(name, scenarios):
+    """A working buffer transformed in place by the elements gives the results of the propagation of new spectral
+    informations, and its snapshots are left unchanged by the next elements"""
+    si_input, elements = in_place_path(name)
+    if scenarios:
+        si_input = SpectralInformation.stack([si_input, si_input._replace(signal=si_input.signal / 2)])
+    expected = []
+    si = si_input
+    for el, kwargs in elements:
+        si = el(si, **kwargs)
+        expected.append(si)
+    expected_attributes = [copy(el.__dict__) for el, _ in elements]
+
+    buffer = SpectralInformationBuffer.from_spectral_information(si_input)
+    snapshots = []
+    for el, kwargs in elements:
+        assert el(buffer, **kwargs) is buffer
+        snapshots.append(buffer.snapshot())
+    for snapshot, expected_si in zip(snapshots, expected):
+        assert array(snapshot.pref) == pytest.approx(array(expected_si.pref), rel=1e-12)
+        for field in ('signal', 'nli', 'ase', 'chromatic_dispersion', 'pmd'):
+            assert getattr(snapshot, field) == pytest.approx(getattr(expected_si, field), rel=1e-12)
+    for (el, _), attributes in zip(elements, expected_attributes):
+        for attribute in ('snr', 'pch_out_db', 'effective_gain', 'effective_pch_out_db', 'effective_loss'):
+            if attribute in attributes:
+                assert array(getattr(el, attribute)) == pytest.approx(array(attributes[attribute]), rel=1e-12)
+    assert (si_input.signal[..., 0] <= 1e-3).all() and not si_input.ase.any()
+
+
+def test_in_place_carriers():
+    """A working buffer given carriers writes their values into its arrays"""
+    spacing = 50e9
+    si = create_input_spectral_information(191.3e12, 191.3e12 + 79 * spacing, 0.15, 32e9, 1e-3, spacing)
+    buffer = SpectralInformationBuffer.from_spectral_information(si)
+    signal = buffer.signal
+    carriers = [carrier._replace(power=carrier.power._replace(signal=carrier.power.signal / 2, ase=1e-6))
+                for carrier in si.carriers]
+    assert buffer._replace(carriers=carriers) is buffer
+    assert buffer.signal is signal
+    assert buffer.signal.tolist() == [5e-4] * 79 and buffer.ase.tolist() == [1e-6] * 79
+    assert [carrier.power for carrier in buffer.carriers] == [carrier.power for carrier in carriers]
+    assert si.signal.tolist() == [1e-3] * 79 and not si.ase.any()
+
+
 if __name__ == '__main__':
     from logging import getLogger, basicConfig, INFO
     logger = getLogger(__name__)
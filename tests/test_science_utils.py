@@ -6,14 +6,26 @@ Checks that RamanFiber propagates properly the spectral information. In this way
 are tested.
 """
 
+import pytest
+from math import ceil
+from pickle import dump
 from pathlib import Path
+from tempfile import gettempdir
+from types import SimpleNamespace
 from pandas import read_csv
+from numpy import arange, arcsinh, array, cos, empty, exp, interp, isin, linspace, log10, ndenumerate, outer, pi, \
+    subtract, where, zeros
 from numpy.testing import assert_allclose
+from scipy.integrate import solve_bvp, solve_ivp
+from scipy.interpolate import interp1d
 
-from gnpy.core.info import create_input_spectral_information
-from gnpy.core.elements import RamanFiber
+from gnpy.core.info import Channel, Power, create_input_spectral_information
+from gnpy.core.elements import Fiber, RamanFiber
 from gnpy.core.parameters import SimParams
-from gnpy.core.science_utils import Simulation
+from gnpy.core.science_utils import NliSolver, RaisedCosineShape, RamanSolver, Simulation, \
+    StimulatedRamanScattering, adaptive_computed_nli, gn_analytic_nli, gauss_legendre_quadrature, nli_cache, \
+    raised_cosine_comb, raised_cosine_shape, raman_cache, raman_coefficients, raman_on_off_gain
+from gnpy.core.utils import db2lin
 from gnpy.tools.json_io import load_json
 
 TEST_DIR = Path(__file__).parent
@@ -46,3 +58,580 @@ def test_raman_fiber():
     assert_allclose(p_signal, expected_results['signal'], rtol=1e-3)
     assert_allclose(p_ase, expected_results['ase'], rtol=1e-3)
     assert_allclose(p_nli, expected_results['nli'], rtol=1e-3)
+
+
+def test_gn_analytic_nli_whole_comb():
+    """ Test that the whole-comb GN kernel matches the per-carrier evaluation and the closed-form SPM."""
+    spectral_info = create_input_spectral_information(191.3e12, 191.3e12 + 79 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    carriers = spectral_info.carriers
+    fiber = Fiber(**load_json(TEST_DIR / 'data' / 'raman_fiber_config.json'))
+    params = fiber.params
+
+    carriers_nli = gn_analytic_nli(carriers, carriers, params)
+    assert_allclose(carriers_nli, [fiber._gn_analytic(carrier, *carriers) for carrier in carriers], rtol=1e-12)
+
+    carrier = carriers[0]
+    spm = (16 / 27) * (params.gamma * params.effective_length)**2 / \
+        (2 * pi * abs(params.beta2) * params.asymptotic_length) * (carrier.power.signal / carrier.baud_rate)**3 * \
+        arcsinh(0.5 * pi**2 * params.asymptotic_length * abs(params.beta2) * carrier.baud_rate**2) * carrier.baud_rate
+    assert_allclose(gn_analytic_nli([carrier], [carrier], params), [spm], rtol=1e-12)
+
+
+def test_generalized_rho_nli_chunks():
+    """ Test that the batched rho integral does not depend on the chunk size and matches the z-step recursion."""
+    z = linspace(0, 80e3, 9)
+    alpha0 = 4.6e-5
+    rho_norm_pump = exp(-1e-5 * z)
+    delta_beta = linspace(-1e-3, 1e-3, 35).reshape(5, 7)
+
+    expected = empty(delta_beta.shape)
+    for index, db in ndenumerate(delta_beta):
+        w = 1j * db - alpha0
+        rho_nli = (rho_norm_pump[-1]**2 * exp(w * z[-1]) - rho_norm_pump[0]**2 * exp(w * z[0])) / w
+        for z_ind in range(len(z) - 1):
+            derivative_rho = (rho_norm_pump[z_ind + 1]**2 - rho_norm_pump[z_ind]**2) / (z[z_ind + 1] - z[z_ind])
+            rho_nli -= derivative_rho * (exp(w * z[z_ind + 1]) - exp(w * z[z_ind])) / w**2
+        expected[index] = abs(rho_nli)**2
+
+    assert_allclose(NliSolver._generalized_rho_nli(delta_beta, rho_norm_pump, z, alpha0), expected, rtol=1e-12)
+    assert_allclose(NliSolver._generalized_rho_nli(delta_beta, rho_norm_pump, z, alpha0, max_chunk_size=20),
+                    expected, rtol=1e-12)
+
+
+def test_xpm_psi_cache(monkeypatch):
+    """ Test that the XPM psi cache gives the same NLI, also when bounded, is cleared with the parameters, and spares
+    the psi integrations of the channel pairs and spans sharing the same values."""
+    spectral_info_input = create_input_spectral_information(191.3e12, 191.3e12 + 40 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    sim_params = load_json(TEST_DIR / 'data' / 'sim_params.json')
+    sim_params['raman_parameters']['flag_raman'] = False
+    sim_params['nli_parameters']['computed_channels'] = [1, 10, 20, 30, 40]
+
+    # XPM psi integrations, the SPM ones are not cached
+    psi_calls = []
+    for method in ('_generalized_psi', '_fast_generalized_psi'):
+        def counted_psi(self, *args, _psi=getattr(NliSolver, method), **kwargs):
+            cut_carrier, pump_carrier = args[:2]
+            if cut_carrier.channel_number != pump_carrier.channel_number:
+                psi_calls.append((cut_carrier, pump_carrier))
+            return _psi(self, *args, **kwargs)
+        monkeypatch.setattr(NliSolver, method, counted_psi)
+
+    p_nli = {}
+    span_calls = {}
+    for tolerance, cache_size in ((None, 4096), (1e-3, 4096), (1e-3, 10)):
+        sim_params['nli_parameters']['xpm_cache_tolerance'] = tolerance
+        Simulation.set_params(SimParams(**sim_params))
+        assert not NliSolver._xpm_psi_cache
+        monkeypatch.setattr(NliSolver, '_xpm_psi_cache_size', cache_size)
+        span_calls[tolerance, cache_size] = []
+        # two identical spans
+        for _ in range(2):
+            psi_calls.clear()
+            fiber = RamanFiber(**load_json(TEST_DIR / 'data' / 'raman_fiber_config.json'))
+            spectral_info_out = fiber(spectral_info_input)
+            span_calls[tolerance, cache_size].append(len(psi_calls))
+        assert len(NliSolver._xpm_psi_cache) <= cache_size
+        p_nli[tolerance, cache_size] = [carrier.power.nli for carrier in spectral_info_out.carriers]
+
+    assert_allclose(p_nli[1e-3, 4096], p_nli[None, 4096], rtol=1e-12)
+    assert_allclose(p_nli[1e-3, 10], p_nli[None, 4096], rtol=1e-12)
+    # without the cache, every (CUT, pump) pair of every span is integrated
+    assert span_calls[None, 4096] == [5 * 39] * 2
+    # with the cache, the pairs with the same frequency offset are integrated once, and the second span not at all
+    assert 0 < span_calls[1e-3, 4096][0] < span_calls[None, 4096][0]
+    assert span_calls[1e-3, 4096][1] == 0
+    # the bounded cache keeps its most recent values
+    assert len(NliSolver._xpm_psi_cache) == 10
+
+
+def test_adaptive_computed_nli():
+    """ Test that the adaptive selection of the computed channels interpolates the NLI within the tolerance."""
+    spectral_info = create_input_spectral_information(191.3e12, 191.3e12 + 96 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    carriers = spectral_info.carriers
+    frequencies = array([carrier.frequency for carrier in carriers])
+
+    def nli_profile(frequency):
+        # tilted profile with a roll-off at the upper band edge
+        return 1e-7 * (1 + 0.5 * (frequency - 191.3e12) / 5e12) * (1 - exp((frequency - 196.15e12) / 2e11))
+
+    calls = []
+
+    def carriers_nli(cut_carriers):
+        calls.extend(carrier.channel_number for carrier in cut_carriers)
+        return [nli_profile(carrier.frequency) for carrier in cut_carriers]
+
+    tolerance = 1e-3
+    nli_frequencies, computed_nli = adaptive_computed_nli(carriers, carriers_nli, tolerance, computed_channels=[48])
+    assert len(calls) == len(set(calls)) < len(carriers) / 2
+    assert {1, 48, 96} <= set(calls)
+    assert_allclose(interp(frequencies, nli_frequencies, computed_nli), nli_profile(frequencies), rtol=2 * tolerance)
+
+
+@pytest.mark.parametrize('computed_channels_tolerance', [None, 0.2])
+def test_parallel_nli_workers(monkeypatch, computed_channels_tolerance):
+    """ Test that the NLI computed by a process pool, shared by the spans of the run, matches the sequential
+    computation, also with the adaptive selection of the computed channels, and that the span files hold only the
+    data of the NLI and are removed."""
+    spectral_info_input = create_input_spectral_information(191.3e12, 191.3e12 + 40 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    sim_params = load_json(TEST_DIR / 'data' / 'sim_params.json')
+    sim_params['nli_parameters']['computed_channels'] = [1, 20, 40]
+    sim_params['nli_parameters']['computed_channels_tolerance'] = computed_channels_tolerance
+    span_files = set(Path(gettempdir()).glob('gnpy_nli_span_*'))
+    span_data = []
+
+    def recorded_dump(obj, file):
+        span_data.append(obj)
+        dump(obj, file)
+    monkeypatch.setattr('gnpy.core.science_utils.dump', recorded_dump)
+
+    p_nli = {}
+    for workers in (None, 2):
+        sim_params['nli_parameters']['workers'] = workers
+        Simulation.set_params(SimParams(**sim_params))
+        spectral_info_out = spectral_info_input
+        executors = set()
+        for _ in range(2):
+            fiber = RamanFiber(**load_json(TEST_DIR / 'data' / 'raman_fiber_config.json'))
+            spectral_info_out = fiber(spectral_info_out)
+            executors.add(Simulation.nli_executor())
+        assert len(executors) == 1
+        p_nli[workers] = [carrier.power.nli for carrier in spectral_info_out.carriers]
+    Simulation.shutdown_nli_executor()
+
+    assert_allclose(p_nli[2], p_nli[None], rtol=1e-12)
+    assert set(Path(gettempdir()).glob('gnpy_nli_span_*')) == span_files
+    # the span files hold the fiber parameters, not the fiber with its solvers
+    assert len(span_data) == 2 and not any(isinstance(data, Fiber) for span in span_data for data in span)
+
+
+def test_raised_cosine_comb():
+    """ Test the vectorized PSD of a comb with mixed baud rates and roll offs against the raised cosine definition."""
+    carriers = [Channel(1, 193.0e12, 32e9, 0.15, Power(1e-3, 0, 0), 0, 0),
+                Channel(2, 193.05e12, 64e9, 0.3, Power(2e-3, 0, 0), 0, 0),
+                Channel(3, 193.1e12, 32e9, 0, Power(1e-3, 0, 0), 0, 0),
+                Channel(4, 193.14e12, 32e9, 0.15, Power(5e-4, 0, 0), 0, 0)]
+    f = linspace(192.9e12, 193.25e12, 707).reshape(7, 101)
+
+    expected = zeros(f.shape)
+    for carrier in carriers:
+        g_ch = carrier.power.signal / carrier.baud_rate
+        ff = abs(f - carrier.frequency)
+        tf = ff - (1 - carrier.roll_off) * carrier.baud_rate / 2
+        if carrier.roll_off == 0:
+            expected += where(tf <= 0, g_ch, 0)
+        else:
+            slope = 1 / 2 * (1 + cos(pi * tf / (carrier.baud_rate * carrier.roll_off)))
+            expected += g_ch * where(tf <= 0, 1, where(ff <= (1 + carrier.roll_off) * carrier.baud_rate / 2, slope, 0))
+
+    assert_allclose(raised_cosine_comb(f, *carriers), expected, rtol=1e-12)
+    assert_allclose(raised_cosine_comb(f, *carriers, max_chunk_size=50), expected, rtol=1e-12)
+    assert_allclose(raised_cosine_comb(f, carriers[0], normalized=True),
+                    raised_cosine_shape(32e9, 0.15)(f - carriers[0].frequency), rtol=1e-12)
+    assert raised_cosine_shape(32e9, 0.15) is raised_cosine_shape(32e9, 0.15)
+
+
+def test_gauss_legendre_quadrature():
+    """ Test the adaptive Gauss-Legendre cubature on the raised cosine shape, whose integral is the baud rate."""
+    shape = RaisedCosineShape(32e9, 0.15)
+    integral, evaluations = gauss_legendre_quadrature(shape, shape.breakpoints(), tolerance=1e-9)
+    assert_allclose(integral, 32e9, rtol=1e-9)
+    integral, evaluations = gauss_legendre_quadrature(lambda f1, f2: shape(f1) * shape(f2 - 1e9),
+                                                      shape.breakpoints(), 1e9 + shape.breakpoints(), tolerance=1e-9)
+    assert_allclose(integral, 32e9**2, rtol=1e-9)
+    assert evaluations == 3 * 3 * 6 * 6 * (1 + 4)
+
+
+def test_gauss_legendre_generalized_psi():
+    """ Test that the Gauss-Legendre integration of the GGN model matches the uniform grids with fewer evaluations."""
+    spectral_info_input = create_input_spectral_information(191.3e12, 191.3e12 + 20 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    sim_params = load_json(TEST_DIR / 'data' / 'sim_params.json')
+    sim_params['raman_parameters']['flag_raman'] = False
+    sim_params['nli_parameters']['computed_channels'] = [1, 10, 20]
+
+    p_nli = {}
+    evaluations = {}
+    for integration_method in ('uniform_grid', 'gauss_legendre'):
+        sim_params['nli_parameters']['integration_method'] = integration_method
+        Simulation.set_params(SimParams(**sim_params))
+        fiber = RamanFiber(**load_json(TEST_DIR / 'data' / 'raman_fiber_config.json'))
+        spectral_info_out = fiber(spectral_info_input)
+        p_nli[integration_method] = [carrier.power.nli for carrier in spectral_info_out.carriers]
+        evaluations[integration_method] = fiber.nli_solver.integrand_evaluations
+
+    assert_allclose(p_nli['gauss_legendre'], p_nli['uniform_grid'], rtol=1e-3)
+    assert evaluations['gauss_legendre'] < evaluations['uniform_grid'] / 2
+
+
+def test_generalized_psi_chunks():
+    """ Test that the uniform grid of the generalized psi integral gives the same result in chunks of f1."""
+    spectral_info_input = create_input_spectral_information(191.3e12, 191.3e12 + 20 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    sim_params = load_json(TEST_DIR / 'data' / 'sim_params.json')
+    sim_params['raman_parameters']['flag_raman'] = False
+    sim_params['nli_parameters']['computed_channels'] = [1]
+    Simulation.set_params(SimParams(**sim_params))
+    fiber = RamanFiber(**load_json(TEST_DIR / 'data' / 'raman_fiber_config.json'))
+    carriers = fiber(spectral_info_input).carriers
+    nli_solver = fiber.nli_solver
+
+    nli_solver.integrand_evaluations = 0
+    expected = nli_solver._generalized_psi(carriers[0], carriers[1], carriers[0].frequency, 1e8, 1e8)
+    evaluations = nli_solver.integrand_evaluations
+    nli_solver.integrand_evaluations = 0
+    generalized_psi = nli_solver._generalized_psi(carriers[0], carriers[1], carriers[0].frequency, 1e8, 1e8,
+                                                  max_chunk_size=1000)
+    assert_allclose(generalized_psi, expected, rtol=1e-12)
+    assert nli_solver.integrand_evaluations == evaluations
+
+
+def test_nli_cache():
+    """ Test that the NLI of a span is computed once per channel plan and input power, within the size limit."""
+    spectral_info_input = create_input_spectral_information(191.3e12, 191.3e12 + 20 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    spectral_info_low = create_input_spectral_information(191.3e12, 191.3e12 + 20 * 50e9, 0.15, 32e9, 5e-4, 50e9)
+    fiber_config = load_json(TEST_DIR / 'data' / 'raman_fiber_config.json')
+    fiber_config['params'].pop('raman_efficiency')
+    fiber = Fiber(**fiber_config)
+    expected_nli = [carrier.power.nli for carrier in fiber(spectral_info_input).carriers]
+
+    nli_cache.clear()
+    nli_cache.max_size = 1
+    try:
+        for spectral_info in (spectral_info_input, spectral_info_input, spectral_info_low, spectral_info_input):
+            spectral_info_out = Fiber(**fiber_config)(spectral_info)
+        assert_allclose([carrier.power.nli for carrier in spectral_info_out.carriers], expected_nli, rtol=1e-12)
+        assert (nli_cache.hits, nli_cache.misses, len(nli_cache)) == (1, 3, 1)
+    finally:
+        nli_cache.clear()
+        nli_cache.max_size = 0
+
+
+def test_raman_cache(tmp_path):
+    """ Test that the Raman solutions are reused from the disk cache, within the size limit."""
+    spectral_info_input = create_input_spectral_information(191.3e12, 191.3e12 + 20 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    spectral_info_low = create_input_spectral_information(191.3e12, 191.3e12 + 20 * 50e9, 0.15, 32e9, 5e-4, 50e9)
+    sim_params = load_json(TEST_DIR / 'data' / 'sim_params.json')
+    sim_params['nli_parameters']['nli_method_name'] = 'gn_model_analytic'
+    Simulation.set_params(SimParams(**sim_params))
+    expected = RamanFiber(**load_json(TEST_DIR / 'data' / 'raman_fiber_config.json'))(spectral_info_input)
+
+    raman_cache.directory = tmp_path
+    raman_cache.clear()
+    try:
+        for spectral_info in (spectral_info_input, spectral_info_input, spectral_info_low, spectral_info_input):
+            spectral_info_out = RamanFiber(**load_json(TEST_DIR / 'data' / 'raman_fiber_config.json'))(spectral_info)
+        assert_allclose([carrier.power for carrier in spectral_info_out.carriers],
+                        [carrier.power for carrier in expected.carriers], rtol=1e-12)
+        assert (raman_cache.hits, raman_cache.misses) == (4, 4)
+        assert len(list(tmp_path.glob('*.npz'))) == 4
+
+        raman_cache.max_size = 0
+        RamanFiber(**load_json(TEST_DIR / 'data' / 'raman_fiber_config.json'))(spectral_info_input._replace(
+            carriers=spectral_info_input.carriers[1:]))
+        assert not list(tmp_path.glob('*'))
+    finally:
+        raman_cache.clear()
+        raman_cache.directory = None
+        raman_cache.max_size = 512 * 2**20
+
+
+def test_srs_closed_form_nli():
+    """ Test that the closed-form SRS-aware NLI matches the GN model without SRS and the GGN model tilt with SRS."""
+    spectral_info_input = create_input_spectral_information(191.3e12, 191.3e12 + 40 * 50e9, 0.15, 32e9, 2e-3, 50e9)
+    sim_params = load_json(TEST_DIR / 'data' / 'sim_params.json')
+
+    p_nli = {}
+    for flag_raman in (False, True):
+        sim_params['raman_parameters']['flag_raman'] = flag_raman
+        for nli_method_name in ('gn_model_analytic', 'srs_closed_form', 'ggn_spectrally_separated'):
+            sim_params['nli_parameters']['nli_method_name'] = nli_method_name
+            sim_params['nli_parameters']['computed_channels'] = [1, 10, 20, 30, 40]
+            Simulation.set_params(SimParams(**sim_params))
+            fiber_config = load_json(TEST_DIR / 'data' / 'raman_fiber_config.json')
+            fiber_config['operational'].pop('raman_pumps')
+            fiber = RamanFiber(**fiber_config)
+            spectral_info_out = fiber(spectral_info_input)
+            p_nli[flag_raman, nli_method_name] = array([carrier.power.nli for carrier in spectral_info_out.carriers])
+
+    # the whole comb is computed at once, matching the NLI of each channel computed separately
+    sim_params['nli_parameters']['nli_method_name'] = 'srs_closed_form'
+    Simulation.set_params(SimParams(**sim_params))
+    carriers = fiber.raman_solver.carriers
+    rho = fiber.nli_solver.stimulated_raman_scattering.rho[:, -1]
+    carriers_nli = array([fiber.nli_solver.compute_nli(carrier, *carriers) for carrier in carriers])
+    assert_allclose(p_nli[True, 'srs_closed_form'], carriers_nli * rho**2 / db2lin(fiber.params.con_out), rtol=1e-9)
+
+    # the other methods are only computed on the computed channels
+    p_nli = {key: value[[0, 9, 19, 29, 39]] for key, value in p_nli.items()}
+    assert_allclose(p_nli[False, 'srs_closed_form'], p_nli[False, 'gn_model_analytic'], rtol=1e-2)
+    # the SRS tilt is reproduced up to the offset of the closed-form approximation
+    closed_form_ratio = p_nli[True, 'srs_closed_form'] / p_nli[True, 'ggn_spectrally_separated']
+    gn_ratio = p_nli[True, 'gn_model_analytic'] / p_nli[True, 'ggn_spectrally_separated']
+    assert_allclose(closed_form_ratio, 1, rtol=0.05)
+    assert closed_form_ratio.ptp() < gn_ratio.ptp() / 4
+
+
+def test_srs_profile():
+    """ Test the SRS profile interpolation against interp1d and its sharing among the NLI computations of a span."""
+    frequency = array([193.1e12, 192.1e12, 195.6e12, 194.3e12])
+    z = linspace(0, 80e3, 9)
+    rho = exp(-outer([1, 1.2, 0.8, 0.9], z) * 2e-5)
+    stimulated_raman_scattering = StimulatedRamanScattering(frequency, z, rho, rho**2)
+    profile = stimulated_raman_scattering.profile
+    assert stimulated_raman_scattering.profile is profile
+
+    f = array([[192.0e12, 192.1e12, 193.5e12], [194.3e12, 195.0e12, 196.0e12]])
+    expected = interp1d(frequency, rho, axis=0, fill_value='extrapolate')(f)
+    assert_allclose(profile.rho(f), expected, rtol=1e-14)
+    assert_allclose(profile.rho(193.5e12), expected[0, 2], rtol=1e-14)
+    assert_allclose(profile.rho_norm(f, 4.6e-5), expected * exp(4.6e-5 * z / 2), rtol=1e-14)
+    assert not profile.z.flags.writeable
+
+
+def test_raman_ode_matrix_form():
+    """ Test the matrix form of the Raman ODEs against the element-wise sums of the gain and loss slices."""
+    frequency = linspace(186e12, 200e12, 12)
+    cr = exp(-abs(subtract.outer(frequency, frequency)) / 5e12) * 4e-14
+    alpha = linspace(4.6e-5, 5e-5, 12)
+    prop_direct = where(arange(12) % 5 == 0, -1, 1)
+    power = outer(linspace(1e-3, 5e-1, 12), exp(-linspace(0, 4, 7)))
+
+    raman_matrix = RamanSolver._raman_gain_loss_matrix(frequency, cr)
+    dpdz = RamanSolver(None)._ode_stimulated_raman(None, power, alpha, raman_matrix, prop_direct)
+
+    expected = empty(power.shape)
+    for (f_ind, z_ind), power_sample in ndenumerate(power):
+        raman_gain = sum(cr[f_ind, f_ind + 1:] * power[f_ind + 1:, z_ind])
+        raman_loss = sum(frequency[f_ind] / frequency[:f_ind] * cr[f_ind, :f_ind] * power[:f_ind, z_ind])
+        expected[f_ind, z_ind] = prop_direct[f_ind] * (-alpha[f_ind] + raman_gain - raman_loss) * power_sample
+    assert_allclose(dpdz, expected, rtol=1e-12)
+
+
+def test_raman_ode_jacobian():
+    """ Test the analytical Jacobians of the Raman boundary value problem against finite differences."""
+    frequency = linspace(186e12, 200e12, 12)
+    cr = exp(-abs(subtract.outer(frequency, frequency)) / 5e12) * 4e-14
+    alpha = linspace(4.6e-5, 5e-5, 12)
+    prop_direct = where(arange(12) % 5 == 0, -1, 1)
+    power = outer(linspace(1e-3, 5e-1, 12), exp(-linspace(0, 4, 7)))
+
+    raman_solver = RamanSolver(None)
+    raman_matrix = RamanSolver._raman_gain_loss_matrix(frequency, cr)
+    jacobian = raman_solver._jacobian_stimulated_raman(None, power, alpha, raman_matrix, prop_direct)
+    dpdz = raman_solver._ode_stimulated_raman(None, power, alpha, raman_matrix, prop_direct)
+    for index in range(len(frequency)):
+        step = zeros(power.shape)
+        step[index] = 1e-7 * power[index]
+        perturbed = raman_solver._ode_stimulated_raman(None, power + step, alpha, raman_matrix, prop_direct)
+        assert_allclose(jacobian[:, index, :] * step[index], perturbed - dpdz, rtol=1e-5, atol=1e-20)
+
+    dbc_dya, dbc_dyb = RamanSolver._residuals_jacobian_stimulated_raman(prop_direct)
+    ya, yb = power[:, 0], power[:, -1]
+    residual = raman_solver._residuals_stimulated_raman(ya, yb, power[:, 0], prop_direct)
+    assert_allclose(raman_solver._residuals_stimulated_raman(ya + 1, yb, power[:, 0], prop_direct) - residual,
+                    dbc_dya.sum(axis=1))
+    assert_allclose(raman_solver._residuals_stimulated_raman(ya, yb + 1, power[:, 0], prop_direct) - residual,
+                    dbc_dyb.sum(axis=1))
+
+
+def equipment_spectral_information(power=1e-3):
+    """ Returns the spectral information of the SI of the test equipment library, at the given channel power."""
+    spectral_info_params = load_json(TEST_DIR / 'data' / 'eqpt_config.json')['SI'][0]
+    for key in ('power_dbm', 'power_range_db', 'tx_osnr', 'sys_margins'):
+        spectral_info_params.pop(key)
+    return create_input_spectral_information(power=power, **spectral_info_params)
+
+
+def set_raman_params(**raman_parameters):
+    """ Sets the test simulation parameters, with the given raman_parameters overridden, and returns them."""
+    sim_params = load_json(TEST_DIR / 'data' / 'sim_params.json')
+    sim_params['raman_parameters'].update(raman_parameters)
+    Simulation.set_params(SimParams(**sim_params))
+    return sim_params
+
+
+def raman_fiber_solver(spectral_info, fiber_config=None):
+    """ Returns the Raman solver of a fiber, by default the test Raman fiber, set up with the carriers of
+    spectral_info and the pumps of the fiber."""
+    if fiber_config is None:
+        fiber_config = load_json(TEST_DIR / 'data' / 'raman_fiber_config.json')
+    raman_solver = RamanFiber(**fiber_config).raman_solver
+    raman_solver.carriers = spectral_info.carriers
+    raman_solver.raman_pumps = raman_solver.fiber.raman_pumps
+    return raman_solver
+
+
+def test_raman_initial_value_problem():
+    """ Test that the initial value problem solved without counter-propagating pumps matches the BVP solution."""
+    spectral_info_input = equipment_spectral_information()
+    set_raman_params()
+
+    for coprop_pumps in (True, False):
+        fiber_config = load_json(TEST_DIR / 'data' / 'raman_fiber_config.json')
+        pumps = fiber_config['operational']['raman_pumps']
+        for pump in pumps:
+            pump['propagation_direction'] = 'coprop'
+        if not coprop_pumps:
+            pumps.clear()
+        raman_solver = raman_fiber_solver(spectral_info_input, fiber_config)
+        stimulated_raman_scattering = raman_solver.stimulated_raman_scattering
+
+        power_spectrum, frequency, prop_direct, _ = raman_solver._compute_power_spectrum(
+            spectral_info_input.carriers, raman_solver.raman_pumps)
+        assert all(prop_direct == 1)
+        cr = interp1d(fiber_config['params']['raman_efficiency']['frequency_offset'],
+                      fiber_config['params']['raman_efficiency']['cr'])(abs(subtract.outer(frequency, frequency)))
+        raman_matrix = RamanSolver._raman_gain_loss_matrix(frequency, cr)
+        z, power, _ = raman_solver._solve_stimulated_raman_bvp(stimulated_raman_scattering.z, power_spectrum,
+                                                               frequency, raman_solver.fiber.alpha(frequency),
+                                                               raman_matrix, prop_direct, 1e-10)
+        assert_allclose(stimulated_raman_scattering.power, interp1d(z, power)(stimulated_raman_scattering.z),
+                        rtol=5e-4)
+
+
+def test_raman_initial_value_problem_failure(monkeypatch):
+    """ Test that the SRS is solved as a BVP when the integration of the initial value problem fails."""
+    spectral_info_input = create_input_spectral_information(191.3e12, 191.3e12 + 40 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    set_raman_params()
+    fiber_config = load_json(TEST_DIR / 'data' / 'raman_fiber_config.json')
+    fiber_config['operational'].pop('raman_pumps')
+
+    def failed_solve_ivp(*args, **kwargs):
+        ivp_solution = solve_ivp(*args, **kwargs)
+        ivp_solution.success = False
+        ivp_solution.y[:] = 0
+        return ivp_solution
+
+    stimulated_raman_scattering = {}
+    for ivp_failure in (False, True):
+        if ivp_failure:
+            monkeypatch.setattr('gnpy.core.science_utils.solve_ivp', failed_solve_ivp)
+        raman_solver = raman_fiber_solver(spectral_info_input, fiber_config)
+        stimulated_raman_scattering[ivp_failure] = raman_solver.stimulated_raman_scattering
+
+    assert_allclose(stimulated_raman_scattering[True].rho[:, -1], stimulated_raman_scattering[False].rho[:, -1],
+                    rtol=5e-4)
+
+
+def test_raman_warm_start():
+    """ Test that the warm-started Raman BVP converges to the cold-started solution along a launch power sweep."""
+    rho = {}
+    for warm_start_tolerance in (None, 3):
+        sim_params = set_raman_params(warm_start_tolerance=warm_start_tolerance)
+        raman_solver = raman_fiber_solver(equipment_spectral_information())
+        for power in (1e-3, 2e-3):
+            raman_solver.carriers = equipment_spectral_information(power).carriers
+            rho[warm_start_tolerance, power] = raman_solver.stimulated_raman_scattering.rho[:, -1]
+            # the warm start is kept on the configured mesh
+            assert len(raman_solver._warm_start.z) == 1 + ceil(raman_solver.fiber.params.length /
+                                                               sim_params['raman_parameters']['space_resolution'])
+    assert_allclose(rho[3, 2e-3], rho[None, 2e-3], rtol=1e-3)
+
+
+def test_raman_spectral_bins():
+    """ Test the SRS solution on spectral bins against the full solution."""
+    spectral_info_input = equipment_spectral_information()
+
+    bins = RamanSolver._spectral_bins(spectral_info_input.carriers, 1e12)
+    assert len(bins) == 5
+    assert_allclose(sum(spectral_bin.power.signal for spectral_bin in bins), 1e-3 * len(spectral_info_input.carriers))
+    assert_allclose(bins[0].frequency, 191.825e12)
+    # the carriers are told apart from the pumps by position, also at the same frequency
+    pumps = [SimpleNamespace(frequency=bins[2].frequency), SimpleNamespace(frequency=bins[0].frequency - 1e12)]
+    order = RamanSolver._slice_order(bins, pumps)
+    assert list(order < len(bins)) == [False, True, True, True, False, True, True]
+
+    stimulated_raman_scattering = {}
+    for spectral_bin_width in (None, 0.5e12):
+        set_raman_params(spectral_bin_width=spectral_bin_width)
+        raman_solver = raman_fiber_solver(spectral_info_input)
+        stimulated_raman_scattering[spectral_bin_width] = raman_solver.stimulated_raman_scattering
+    full, binned = stimulated_raman_scattering[None], stimulated_raman_scattering[0.5e12]
+    assert_allclose(binned.frequency, full.frequency)
+    assert_allclose(binned.rho[:, -1], interp1d(full.z, full.rho)(binned.z[-1]), rtol=1e-2)
+    assert_allclose(binned.power[:-2], binned.rho[:-2] ** 2 * 1e-3)
+
+
+def test_raman_adaptive_mesh(monkeypatch):
+    """ Test the adaptive sampling of the SRS solution against the uniform one, and that the BVP solver then starts
+    from a coarse mesh."""
+    spectral_info_input = equipment_spectral_information()
+    solve_bvp_meshes = []
+
+    def recorded_solve_bvp(fun, bc, x, *args, **kwargs):
+        solve_bvp_meshes.append(len(x))
+        return solve_bvp(fun, bc, x, *args, **kwargs)
+    monkeypatch.setattr('gnpy.core.science_utils.solve_bvp', recorded_solve_bvp)
+
+    for pumps in (True, False):
+        stimulated_raman_scattering = {}
+        for adaptive_mesh_tolerance in (None, 1e-3):
+            set_raman_params(space_resolution=1e3, adaptive_mesh_tolerance=adaptive_mesh_tolerance)
+            fiber_config = load_json(TEST_DIR / 'data' / 'raman_fiber_config.json')
+            if not pumps:
+                fiber_config['operational']['raman_pumps'].clear()
+            raman_solver = raman_fiber_solver(spectral_info_input, fiber_config)
+            solve_bvp_meshes.clear()
+            stimulated_raman_scattering[adaptive_mesh_tolerance] = raman_solver.stimulated_raman_scattering
+            if pumps and adaptive_mesh_tolerance:
+                # the solution on a coarse mesh is solved again on its adaptive mesh
+                assert solve_bvp_meshes[0] == 5 and len(solve_bvp_meshes) == 2
+        uniform, adaptive = stimulated_raman_scattering[None], stimulated_raman_scattering[1e-3]
+        assert adaptive.z[0] == 0 and adaptive.z[-1] == uniform.z[-1]
+        assert len(adaptive.z) < (len(uniform.z) if pumps else len(uniform.z) / 5)
+        carriers = slice(0, len(spectral_info_input.carriers))
+        assert_allclose(adaptive.rho[carriers], interp1d(uniform.z, uniform.rho[carriers])(adaptive.z), rtol=1e-3)
+
+
+def test_raman_coefficients():
+    """ Test that the spans of the same fiber type share read-only Raman coefficients and leave their parameters
+    unchanged, also without Raman effect."""
+    spectral_info_input = create_input_spectral_information(191.3e12, 191.3e12 + 20 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    fiber_config = load_json(TEST_DIR / 'data' / 'raman_fiber_config.json')
+    expected_cr = list(fiber_config['params']['raman_efficiency']['cr'])
+    sim_params = load_json(TEST_DIR / 'data' / 'sim_params.json')
+    sim_params['nli_parameters']['nli_method_name'] = 'gn_model_analytic'
+
+    for flag_raman in (False, True):
+        sim_params['raman_parameters']['flag_raman'] = flag_raman
+        Simulation.set_params(SimParams(**sim_params))
+        fibers = [RamanFiber(**fiber_config) for _ in range(2)]
+        for fiber in fibers:
+            fiber(spectral_info_input)
+        assert fiber_config['params']['raman_efficiency']['cr'] == expected_cr
+
+        frequency = fibers[0].raman_solver.stimulated_raman_scattering.frequency
+        coefficients = raman_coefficients(fibers[0], frequency, flag_raman)
+        assert raman_coefficients(fibers[1], frequency, flag_raman) is coefficients
+        assert not coefficients.cr.flags.writeable
+        assert (coefficients.cr != 0).any() == flag_raman
+        assert_allclose(coefficients.alpha, fibers[0].alpha(frequency))
+
+
+def test_raman_on_off_gain():
+    """ Test the on-off gain of a batch of pump configurations against the SRS solutions of each configuration, with
+    and without worker processes."""
+    spectral_info_input = create_input_spectral_information(191.3e12, 191.3e12 + 20 * 50e9, 0.15, 32e9, 1e-3, 50e9)
+    fiber_config = load_json(TEST_DIR / 'data' / 'raman_fiber_config.json')
+    sim_params = load_json(TEST_DIR / 'data' / 'sim_params.json')
+    Simulation.set_params(SimParams(**sim_params))
+    fiber = RamanFiber(**fiber_config)
+    pumps = fiber_config['operational']['raman_pumps']
+    pump_frequencies = [pump['frequency'] for pump in pumps]
+    propagation_directions = [pump['propagation_direction'] for pump in pumps]
+    pump_powers = outer([0.25, 0.5, 1], [pump['power'] for pump in pumps])
+
+    gain = raman_on_off_gain(fiber, spectral_info_input.carriers, pump_powers, pump_frequencies,
+                             propagation_directions)
+    assert gain.shape == (3, len(spectral_info_input.carriers))
+    assert (gain[0] > 0).all() and (gain[1] > gain[0]).all() and (gain[2] > gain[1]).all()
+
+    raman_solver = RamanSolver(fiber)
+    raman_solver.carriers = spectral_info_input.carriers
+    raman_solver.raman_pumps = None
+    rho_off = raman_solver.stimulated_raman_scattering.rho[:, -1]
+    raman_solver.raman_pumps = fiber.raman_pumps
+    stimulated_raman_scattering = raman_solver.stimulated_raman_scattering
+    carriers = isin(stimulated_raman_scattering.frequency, [carrier.frequency for carrier in raman_solver.carriers])
+    assert_allclose(gain[2], 20 * log10(stimulated_raman_scattering.rho[carriers, -1] / rho_off), rtol=1e-6)
+
+    assert_allclose(raman_on_off_gain(fiber, spectral_info_input.carriers, pump_powers, pump_frequencies,
+                                      propagation_directions, workers=2), gain, rtol=1e-6)